@@ -20,19 +20,30 @@ router = APIRouter(prefix="/agents", tags=["agents"])
 # This eliminates the deprecated on_event usage and improves code organization
 
 
-@router.get("/", response_model=PaginatedResponse[Agent])
+@router.get(
+    "/",
+    response_model=PaginatedResponse[Agent],
+    response_model_exclude_none=True,
+)
 async def list_agents(
     search: Optional[str] = None,
     is_team: Optional[bool] = None,
     page: int = Query(1, description="Page number", ge=1),
     page_size: int = Query(20, description="Items per page", ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page"),
 ):
     """List agents with pagination and optional filtering."""
     try:
         response = await search_agents(
-            search=search, is_team=is_team, page=page, page_size=page_size
+            search=search,
+            is_team=is_team,
+            page=page,
+            page_size=page_size,
+            cursor=cursor,
         )
         return response
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing agents: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to list agents: {str(e)}")
@@ -1,11 +1,21 @@
 """API routes for managing federated registries and synchronizing agent data."""
 
+import asyncio
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks
-from math import ceil
 import httpx
+import orjson
+from tenacity import (
+    retry,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_fixed,
+)
 
 from app.db.client import Database
 from app.core.auth import get_current_user_from_api_key
+from app.utils.cache_utils import cached_response, clear_response_cache
+from app.utils.cursor_utils import encode_cursor
 from app.models.schemas import (
     FederatedRegistry,
     FederatedRegistryCreate,
@@ -17,11 +27,48 @@ from app.models.schemas import (
 
 router = APIRouter(prefix="/federated-registries", tags=["federated-registries"])
 
+# Upper bound on the agent list we are willing to buffer from a remote registry
+MAX_REGISTRY_RESPONSE_BYTES = 10 * 1024 * 1024
+
+# Cache namespace for the paginated registry listing
+REGISTRY_LIST_CACHE = "federated_registries"
+
+# Maximum number of federated agent batches written to the database at once
+SYNC_CONCURRENCY = 4
+
+# Number of federated agents upserted per request
+SYNC_BATCH_SIZE = 500
+
+# Fail fast when probing a registry URL so a dead host can't pin a worker
+REGISTRY_PROBE_TIMEOUT = httpx.Timeout(connect=2.0, read=3.0, write=2.0, pool=2.0)
 
-@router.get("/", response_model=PaginatedResponse[FederatedRegistry])
+
+@retry(
+    stop=stop_after_attempt(2),
+    wait=wait_fixed(0.2),
+    retry=retry_if_exception_type(httpx.ConnectError),
+    reraise=True,
+)
+async def _probe_registry(client: httpx.AsyncClient, url: str) -> None:
+    """Check that a registry URL answers, preferring HEAD over a full GET."""
+    response = await client.head(url, follow_redirects=True)
+    if response.status_code == 405:
+        response = await client.get(url, follow_redirects=True)
+    response.raise_for_status()
+
+
+@router.get(
+    "/",
+    response_model=PaginatedResponse[FederatedRegistry],
+    response_model_exclude_none=True,
+)
+@cached_response(
+    namespace=REGISTRY_LIST_CACHE, ttl=15, key_params=("page", "size", "cursor")
+)
 async def list_federated_registries(
     page: int = Query(1, description="Page number", ge=1),
     size: int = Query(20, description="Page size", ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page"),
     current_user=Depends(get_current_user_from_api_key),
 ):
     """List all federated registries (requires authentication, paginated)."""
@@ -29,22 +76,35 @@ async def list_federated_registries(
         # Calculate offset from page and size
         offset = (page - 1) * size
 
-        # Get the count first
-        total_count = await Database.count_federated_registries()
-
-        # Then get the paginated results
-        registries = await Database.list_federated_registries(limit=size, offset=offset)
+        # Get the count and the paginated results concurrently
+        total_count, registries = await asyncio.gather(
+            Database.count_federated_registries(),
+            Database.list_federated_registries(
+                limit=size, offset=offset, cursor=cursor
+            ),
+        )
 
         # Calculate pagination metadata
-        total_pages = ceil(total_count / size)
+        total_pages = (total_count + size - 1) // size if size else 0
 
         # Return paginated response with updated structure
         return PaginatedResponse(
             items=registries,
             metadata=PaginationMetadata(
-                total=total_count, page=page, page_size=size, total_pages=total_pages
+                total=total_count,
+                page=page,
+                page_size=size,
+                total_pages=total_pages,
+                next_cursor=(
+                    encode_cursor(registries[-1]) if len(registries) == size else None
+                ),
             ),
         )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -60,10 +120,9 @@ async def add_federated_registry(
     """Add a new federated registry (requires authentication)."""
     try:
         # Validate the registry URL by making a request to it
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        async with httpx.AsyncClient(timeout=REGISTRY_PROBE_TIMEOUT) as client:
             try:
-                response = await client.get(f"{registry.url.rstrip('/')}/")
-                response.raise_for_status()
+                await _probe_registry(client, f"{registry.url.rstrip('/')}/")
             except httpx.HTTPError:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
@@ -73,6 +132,7 @@ async def add_federated_registry(
         # Create the federated registry
         registry_data = registry.model_dump()
         created_registry = await Database.add_federated_registry(registry_data)
+        clear_response_cache(REGISTRY_LIST_CACHE)
         return created_registry
     except Exception as e:
         if isinstance(e, HTTPException):
@@ -116,7 +176,11 @@ async def sync_federated_registry(
         )
 
 
-@router.get("/{registry_id}/agents", response_model=PaginatedResponse[Agent])
+@router.get(
+    "/{registry_id}/agents",
+    response_model=PaginatedResponse[Agent],
+    response_model_exclude_none=True,
+)
 async def list_federated_registry_agents(
     registry_id: str,
     page: int = Query(1, description="Page number", ge=1),
@@ -128,8 +192,17 @@ async def list_federated_registry_agents(
         # Calculate offset from page and size
         offset = (page - 1) * size
 
-        # Get the federated registry
-        registry = await Database.get_federated_registry(registry_id)
+        # The page only needs the registry ID, so fetch it alongside the
+        # registry lookup and discard it if the registry does not exist
+        registry, total_count, agents = await asyncio.gather(
+            Database.get_federated_registry(registry_id),
+            Database.count_agents(registry_id=registry_id),
+            Database.list_agents(limit=size, offset=offset, registry_id=registry_id),
+            return_exceptions=True,
+        )
+
+        if isinstance(registry, BaseException):
+            raise registry
 
         if not registry:
             raise HTTPException(
@@ -137,16 +210,12 @@ async def list_federated_registry_agents(
                 detail="Federated registry not found",
             )
 
-        # Get the count first
-        total_count = await Database.count_agents(registry_id=registry_id)
-
-        # Then get the paginated results
-        agents = await Database.list_agents(
-            limit=size, offset=offset, registry_id=registry_id
-        )
+        for result in (total_count, agents):
+            if isinstance(result, BaseException):
+                raise result
 
         # Calculate pagination metadata
-        total_pages = ceil(total_count / size)
+        total_pages = (total_count + size - 1) // size if size else 0
 
         # Return paginated response with updated structure
         return PaginatedResponse(
@@ -176,62 +245,89 @@ async def sync_registry_agents(registry):
             if registry.get("api_key"):
                 headers["X-API-Key"] = registry["api_key"]
 
-            # Get agents from the federated registry
-            response = await client.get(
-                f"{registry['url'].rstrip('/')}/agents", headers=headers
-            )
+            # Only download the agent list if it changed since the last sync
+            if registry.get("last_etag"):
+                headers["If-None-Match"] = registry["last_etag"]
+            if registry.get("last_modified"):
+                headers["If-Modified-Since"] = registry["last_modified"]
+
+            # Stream agents from the federated registry so the body is bounded
+            async with client.stream(
+                "GET", f"{registry['url'].rstrip('/')}/agents", headers=headers
+            ) as response:
+                # Nothing changed upstream, so there is nothing to ingest
+                if response.status_code == 304:
+                    await Database.update_federated_registry_sync_time(registry["id"])
+                    clear_response_cache(REGISTRY_LIST_CACHE)
+                    return
+
+                # Check if successful
+                if response.status_code != 200:
+                    print(
+                        f"Failed to sync with {registry['name']}: Status {response.status_code}"
+                    )
+                    return
 
-            # Check if successful
-            if response.status_code != 200:
-                print(
-                    f"Failed to sync with {registry['name']}: Status {response.status_code}"
-                )
-                return
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
 
-            # Parse response
-            agents_data = response.json()
-
-            # Process each agent
-            for agent_data in agents_data.get("items", []):
-                # Add federation metadata
-                agent_data["is_federated"] = True
-                agent_data["federation_source"] = registry["url"]
-                agent_data["registry_id"] = registry["id"]
-
-                # Ensure federation_id is set from the remote agent's id
-                if "id" in agent_data:
-                    agent_data["federation_id"] = agent_data["id"]
-
-                # Extract verification data if present
-                verification_data = None
-                if "verification" in agent_data:
-                    verification_data = agent_data.pop("verification")
-
-                # Check if agent already exists (by name or unique identifier)
-                existing_agent = None
-                if "id" in agent_data:
-                    existing_agent = await Database.get_agent_by_federation_id(
-                        federation_id=agent_data["id"], registry_id=registry["id"]
-                    )
+                body = bytearray()
+                async for chunk in response.aiter_bytes():
+                    body.extend(chunk)
+                    if len(body) > MAX_REGISTRY_RESPONSE_BYTES:
+                        print(
+                            f"Failed to sync with {registry['name']}: "
+                            f"Response exceeds {MAX_REGISTRY_RESPONSE_BYTES} bytes"
+                        )
+                        return
 
-                # Create or update the agent
-                created_agent = None
-                if existing_agent:
-                    # Update existing agent
-                    created_agent = await Database.update_federated_agent(
-                        existing_agent["id"], agent_data
+            # Parse response
+            agents_data = orjson.loads(body)
+
+            # Split off verification records; they live in their own table
+            items = agents_data.get("items", [])
+            verifications = {}
+            for agent_data in items:
+                verification = agent_data.pop("verification", None)
+                if verification and "id" in agent_data:
+                    verifications[str(agent_data["id"])] = verification
+
+            # Upsert agents in batches with bounded concurrency
+            semaphore = asyncio.Semaphore(SYNC_CONCURRENCY)
+            await asyncio.gather(
+                *(
+                    _sync_federated_batch(
+                        items[start : start + SYNC_BATCH_SIZE],
+                        registry,
+                        verifications,
+                        semaphore,
                     )
-                else:
-                    # Create new federated agent
-                    created_agent = await Database.create_federated_agent(agent_data)
-
-                # Create verification record if verification data was provided
-                if verification_data and created_agent:
-                    verification_data["agent_id"] = created_agent["id"]
-                    await Database.create_agent_verification(verification_data)
+                    for start in range(0, len(items), SYNC_BATCH_SIZE)
+                )
+            )
 
-        # Update last synced timestamp
-        await Database.update_federated_registry_sync_time(registry["id"])
+        # Update last synced timestamp and the validators for the next sync
+        await Database.update_federated_registry_sync_time(
+            registry["id"], etag=etag, last_modified=last_modified
+        )
+        clear_response_cache(REGISTRY_LIST_CACHE)
 
     except Exception as e:
         print(f"Error synchronizing with {registry['name']}: {str(e)}")
+
+
+async def _sync_federated_batch(
+    batch, registry, verifications, semaphore: asyncio.Semaphore
+):
+    """Upsert a batch of federated agents and store their verification records."""
+    async with semaphore:
+        synced_agents = await Database.upsert_federated_agents(batch, registry["id"])
+
+        # Create verification records for agents that provided them
+        pending = []
+        for agent in synced_agents:
+            verification_data = verifications.get(agent.get("federation_id"))
+            if verification_data:
+                verification_data["agent_id"] = agent["id"]
+                pending.append(Database.create_agent_verification(verification_data))
+        await asyncio.gather(*pending)
@@ -1,11 +1,12 @@
 """API routes for agent health management and monitoring."""
 
+import asyncio
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from math import ceil
 
 from app.db.client import Database
 from app.core.auth import get_current_user_from_api_key
+from app.utils.cache_utils import cached_response
 from app.models.schemas import (
     AgentHealthCreate,
     AgentHealth,
@@ -39,7 +40,11 @@ async def agent_health_ping(
         )
 
 
-@router.get("/agents/{agent_id}", response_model=List[AgentHealth])
+@router.get(
+    "/agents/{agent_id}",
+    response_model=List[AgentHealth],
+    response_model_exclude_none=True,
+)
 async def get_agent_health(agent_id: str):
     """Get the health status for a specific agent across all servers."""
     try:
@@ -52,7 +57,11 @@ async def get_agent_health(agent_id: str):
         )
 
 
-@router.get("/", response_model=PaginatedResponse[AgentHealth])
+@router.get(
+    "/",
+    response_model=PaginatedResponse[AgentHealth],
+    response_model_exclude_none=True,
+)
 async def list_agent_health(
     server_id: Optional[str] = Query(None, description="Filter by server ID"),
     page: int = Query(1, description="Page number", ge=1),
@@ -63,16 +72,14 @@ async def list_agent_health(
         # Calculate offset from page and size
         offset = (page - 1) * size
 
-        # Get the count first
-        total_count = await Database.count_agent_health(server_id=server_id)
-
-        # Then get the paginated results
-        health_records = await Database.list_agent_health(
-            limit=size, offset=offset, server_id=server_id
+        # Get the count and the paginated results concurrently
+        total_count, health_records = await asyncio.gather(
+            Database.count_agent_health(server_id=server_id),
+            Database.list_agent_health(limit=size, offset=offset, server_id=server_id),
         )
 
         # Calculate pagination metadata
-        total_pages = ceil(total_count / size)
+        total_pages = (total_count + size - 1) // size if size else 0
 
         # Return paginated response
         # Construct paginated response
@@ -95,7 +102,12 @@ async def list_agent_health(
         )
 
 
-@router.get("/summary", response_model=List[AgentHealthSummary])
+@router.get(
+    "/summary",
+    response_model=List[AgentHealthSummary],
+    response_model_exclude_none=True,
+)
+@cached_response(namespace="health_summary", ttl=30)
 async def get_agent_health_summary():
     """Get a summary of agent health status grouped by agent."""
     try:
@@ -1,11 +1,13 @@
 """API routes for user authentication, token management, and user profiles."""
 
+import asyncio
 from datetime import datetime, timedelta, timezone
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Response, Query, Request
-from math import ceil
 
 from app.db.client import Database
-from app.core.auth import get_current_user_from_api_key
+from app.core.auth import get_current_user_from_api_key, invalidate_api_key
+from app.utils.cursor_utils import encode_cursor
 from app.models.schemas import (
     ApiKeyCreate,
     ApiKeyResponse,
@@ -96,19 +98,18 @@ async def create_api_token(
     """
     try:
         # Calculate expiry date if provided
-        expires_at = None
-        if hasattr(api_key_data, "expires_at") and api_key_data.expires_at is not None:
-            expires_at = api_key_data.expires_at
-        elif api_key_data.expires_in_days:
-            expires_at = datetime.now(timezone.utc) + timedelta(
-                days=api_key_data.expires_in_days
-            )
+        now = datetime.now(timezone.utc)
+        expires_at = getattr(api_key_data, "expires_at", None) or (
+            now + timedelta(days=api_key_data.expires_in_days)
+            if api_key_data.expires_in_days
+            else None
+        )
 
         # Create the API key
         new_api_key = await Database.create_api_key(
             user_id=current_user["id"],
             name=api_key_data.name,
-            expires_at=expires_at.isoformat() if expires_at else None,
+            expires_at=expires_at,
             is_active=True,
             description=api_key_data.description
             if hasattr(api_key_data, "description")
@@ -123,14 +124,7 @@ async def create_api_token(
                 "Content-Type, Authorization, X-API-Key"
             )
 
-        return ApiKeyResponse(
-            id=new_api_key["id"],
-            name=new_api_key["name"],
-            key=new_api_key["key"],
-            created_at=new_api_key["created_at"],
-            expires_at=new_api_key.get("expires_at"),
-            description=new_api_key.get("description"),
-        )
+        return ApiKeyResponse.model_validate(new_api_key)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -138,10 +132,15 @@ async def create_api_token(
         )
 
 
-@router.get("/tokens", response_model=PaginatedResponse[ApiKeyResponse])
+@router.get(
+    "/tokens",
+    response_model=PaginatedResponse[ApiKeyResponse],
+    response_model_exclude_none=True,
+)
 async def list_api_tokens(
     page: int = Query(1, description="Page number", ge=1),
     size: int = Query(20, description="Page size", ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page"),
     current_user=Depends(get_current_user_from_api_key),
 ):
     """List all API tokens for the authenticated user (paginated)."""
@@ -149,24 +148,33 @@ async def list_api_tokens(
         # Calculate offset from page and size
         offset = (page - 1) * size
 
-        # Get the count first
-        total_count = await Database.count_api_keys(user_id=current_user["id"])
-
-        # Then get the paginated results
-        tokens = await Database.list_api_keys(
-            user_id=current_user["id"], limit=size, offset=offset
+        # Get the count and the paginated results concurrently
+        total_count, tokens = await asyncio.gather(
+            Database.count_api_keys(user_id=current_user["id"]),
+            Database.list_api_keys(
+                user_id=current_user["id"], limit=size, offset=offset, cursor=cursor
+            ),
         )
 
         # Calculate pagination metadata
-        total_pages = ceil(total_count / size)
+        total_pages = (total_count + size - 1) // size if size else 0
 
         # Return paginated response with updated structure
         return PaginatedResponse(
             items=tokens,
             metadata=PaginationMetadata(
-                total=total_count, page=page, page_size=size, total_pages=total_pages
+                total=total_count,
+                page=page,
+                page_size=size,
+                total_pages=total_pages,
+                next_cursor=encode_cursor(tokens[-1]) if len(tokens) == size else None,
             ),
         )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -193,6 +201,9 @@ async def delete_api_token(
                 detail="API token not found",
             )
 
+        # Revoke immediately rather than waiting for the cache TTL
+        invalidate_api_key(token_id)
+
         return ApiResponse(
             success=True,
             message="API token deleted successfully",
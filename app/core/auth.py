@@ -2,14 +2,17 @@
 
 import os
 import secrets
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Dict, Optional, Any
-from jose import jwt
+import jwt
+from cachetools import TTLCache
+from dateutil.parser import isoparse
 from fastapi import Depends, HTTPException, status
 from fastapi.security import APIKeyHeader
 from dotenv import load_dotenv
 
-from app.db.client import Database
+from app.core import auth_lastused
+from app.db.client import Database, hash_api_key
 
 # Load environment variables
 load_dotenv()
@@ -22,6 +25,53 @@ JWT_SECRET = os.getenv("JWT_SECRET", secrets.token_hex(32))
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
 
+# Validated API keys, keyed by key hash so raw keys are never held in memory
+API_KEY_CACHE_TTL = int(os.getenv("API_KEY_CACHE_TTL", "60"))
+_api_key_cache: TTLCache = TTLCache(maxsize=10_000, ttl=API_KEY_CACHE_TTL)
+# Key id -> key hash, so revoked keys can be evicted without a scan
+_api_key_cache_ids: TTLCache = TTLCache(maxsize=10_000, ttl=API_KEY_CACHE_TTL)
+
+
+async def _validate_api_key_cached(api_key: str) -> Optional[Dict[str, Any]]:
+    """Validate an API key, serving recently validated keys from memory."""
+    digest = hash_api_key(api_key)
+    cached = _api_key_cache.get(digest)
+    if cached is not None:
+        key_data, expires_at = cached
+        if expires_at is None or expires_at > datetime.now(timezone.utc):
+            return key_data
+
+        # The key expired while it was cached
+        _api_key_cache.pop(digest, None)
+        return None
+
+    key_data = await Database.validate_api_key(api_key)
+    if key_data:
+        # Parse the expiry once so cache hits only compare datetimes. PostgREST
+        # may send a Z suffix or short fractions, which fromisoformat rejects
+        # before Python 3.11
+        expires_at = key_data.get("api_key", {}).get("expires_at")
+        if isinstance(expires_at, str):
+            expires_at = isoparse(expires_at)
+        _api_key_cache[digest] = (key_data, expires_at)
+        key_id = key_data.get("api_key", {}).get("id")
+        if key_id:
+            _api_key_cache_ids[key_id] = digest
+    return key_data
+
+
+def invalidate_api_key(key_id: str) -> None:
+    """Drop a revoked API key from the validation cache."""
+    digest = _api_key_cache_ids.pop(key_id, None)
+    if digest is not None:
+        _api_key_cache.pop(digest, None)
+
+
+def clear_api_key_cache() -> None:
+    """Drop all cached API key validations."""
+    _api_key_cache.clear()
+    _api_key_cache_ids.clear()
+
 
 class Auth:
     """Authentication handler for generating and validating tokens and API keys."""
@@ -35,8 +85,8 @@ class Auth:
                 detail="API key is missing",
             )
 
-        # Validate API key against database
-        key_data = await Database.validate_api_key(api_key)
+        # Validate API key against the cache, falling back to the database
+        key_data = await _validate_api_key_cached(api_key)
 
         if not key_data:
             raise HTTPException(
@@ -44,8 +94,10 @@ class Auth:
                 detail="Invalid API key",
             )
 
-        # Update last_used_at timestamp
-        # This would be implemented in the Database class
+        # Buffer the last_used_at update; it is written in batches
+        key_id = key_data.get("api_key", {}).get("id")
+        if key_id:
+            auth_lastused.mark_used(key_id)
 
         return key_data
 
@@ -56,10 +108,9 @@ class Auth:
         """Create a JWT access token with the given data and expiration."""
         to_encode = data.copy()
 
-        if expires_delta:
-            expire = datetime.utcnow() + expires_delta
-        else:
-            expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        expire = datetime.now(timezone.utc) + (
+            expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        )
 
         to_encode.update({"exp": expire})
         encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
@@ -72,9 +123,7 @@ class Auth:
     ) -> Dict[str, Any]:
         """Generate a new API key for a user."""
         # Generate API key
-        return await Database.create_api_key(
-            user_id, name, expires_at.isoformat() if expires_at else None
-        )
+        return await Database.create_api_key(user_id, name, expires_at)
 
 
 async def get_current_user_from_api_key(
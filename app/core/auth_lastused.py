@@ -0,0 +1,77 @@
+"""Coalesced last_used_at tracking for API keys."""
+
+import asyncio
+import os
+from datetime import datetime, timezone
+from typing import Optional, Set
+
+from loguru import logger
+
+from app.db.client import Database
+
+# Seconds between flushes of buffered API key usage
+LAST_USED_FLUSH_INTERVAL = float(os.getenv("API_KEY_LAST_USED_FLUSH_INTERVAL", "5"))
+
+# Flush early once this many distinct keys are waiting
+LAST_USED_MAX_PENDING = 1000
+
+_pending: Set[str] = set()
+_flush_requested: Optional[asyncio.Event] = None
+_flusher_task: Optional[asyncio.Task] = None
+
+
+def mark_used(key_id: str) -> None:
+    """Record that an API key was used, without touching the database."""
+    _pending.add(key_id)
+    if len(_pending) >= LAST_USED_MAX_PENDING and _flush_requested is not None:
+        _flush_requested.set()
+
+
+async def flush() -> None:
+    """Write all buffered API key usage to the database in one update."""
+    if not _pending:
+        return
+
+    key_ids = list(_pending)
+    _pending.clear()
+    try:
+        await Database.update_api_keys_last_used(
+            key_ids, datetime.now(timezone.utc).isoformat()
+        )
+    except Exception as e:
+        logger.error(f"❌ Error flushing API key usage: {str(e)}")
+
+
+async def _flusher(flush_requested: asyncio.Event) -> None:
+    """Flush buffered usage every interval, or sooner when the buffer fills."""
+    while True:
+        try:
+            await asyncio.wait_for(
+                flush_requested.wait(), timeout=LAST_USED_FLUSH_INTERVAL
+            )
+        except asyncio.TimeoutError:
+            pass
+        flush_requested.clear()
+        await flush()
+
+
+def start_flusher() -> None:
+    """Start the background flusher if it is not already running."""
+    global _flusher_task, _flush_requested
+    if _flusher_task is None or _flusher_task.done():
+        _flush_requested = asyncio.Event()
+        _flusher_task = asyncio.create_task(_flusher(_flush_requested))
+
+
+async def stop_flusher() -> None:
+    """Stop the background flusher and write any remaining usage."""
+    global _flusher_task, _flush_requested
+    if _flusher_task is not None:
+        _flusher_task.cancel()
+        try:
+            await _flusher_task
+        except asyncio.CancelledError:
+            pass
+        _flusher_task = None
+        _flush_requested = None
+    await flush()
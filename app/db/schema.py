@@ -2,6 +2,7 @@
 
 # Supabase Schema Definition
 SUPABASE_SCHEMA = {
+    "extensions": ["pg_trgm"],
     "tables": [
         {
             "name": "users",
@@ -33,7 +34,8 @@ SUPABASE_SCHEMA = {
                     "notNull": True,
                     "references": {"table": "users", "column": "id"},
                 },
-                {"name": "key", "type": "text", "notNull": True, "unique": True},
+                {"name": "key", "type": "text", "unique": True},
+                {"name": "key_hash", "type": "text"},
                 {"name": "name", "type": "text", "notNull": True},
                 {"name": "description", "type": "text"},
                 {
@@ -71,6 +73,8 @@ SUPABASE_SCHEMA = {
                     "default": "now()",
                 },
                 {"name": "last_synced_at", "type": "timestamp with time zone"},
+                {"name": "last_etag", "type": "text"},
+                {"name": "last_modified", "type": "text"},
             ],
         },
         {
@@ -110,6 +114,7 @@ SUPABASE_SCHEMA = {
                     "default": False,
                 },
                 {"name": "federation_source", "type": "text"},
+                {"name": "federation_id", "type": "text"},
                 {
                     "name": "registry_id",
                     "type": "uuid",
@@ -209,6 +214,58 @@ SUPABASE_SCHEMA = {
             ],
         },
     ],
+    # Idempotent data and index changes, run before indexes are created
+    "migrations": [
+        {
+            # Federated agents used to be created without registry_id, which
+            # the sync upsert matches on. Fill it in from federation_source,
+            # keeping only the most recently updated copy of each agent
+            "name": "backfill_agents_registry_id",
+            "sql": """UPDATE agents a
+SET registry_id = pick.registry_id
+FROM (
+    SELECT DISTINCT ON (r.id, f.federation_id) f.id, r.id AS registry_id
+    FROM agents f
+    JOIN federated_registries r ON r.id::text = f.federation_source
+    WHERE f.registry_id IS NULL AND f.federation_id IS NOT NULL
+    ORDER BY r.id, f.federation_id, f.updated_at DESC NULLS LAST
+) pick
+WHERE a.id = pick.id
+AND NOT EXISTS (
+    SELECT 1 FROM agents b
+    WHERE b.registry_id = pick.registry_id AND b.federation_id = a.federation_id
+)""",
+        },
+        {
+            # Replaced by the non-partial idx_agents_registry_federation
+            "name": "drop_idx_agents_federation",
+            "sql": "DROP INDEX CONCURRENTLY IF EXISTS idx_agents_federation",
+        },
+        {
+            # API keys are looked up by hash; tables created before that
+            # only have the plaintext key column
+            "name": "add_api_keys_key_hash",
+            "sql": "ALTER TABLE api_keys ADD COLUMN IF NOT EXISTS key_hash text",
+        },
+        {
+            "name": "idx_api_keys_hash",
+            "sql": "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_api_keys_hash ON api_keys (key_hash)",
+        },
+        {
+            # Raw keys are no longer stored, so new rows leave key empty
+            "name": "drop_api_keys_key_not_null",
+            "sql": "ALTER TABLE api_keys ALTER COLUMN key DROP NOT NULL",
+        },
+        {
+            # Validators sent back on conditional registry syncs
+            "name": "add_federated_registries_last_etag",
+            "sql": "ALTER TABLE federated_registries ADD COLUMN IF NOT EXISTS last_etag text",
+        },
+        {
+            "name": "add_federated_registries_last_modified",
+            "sql": "ALTER TABLE federated_registries ADD COLUMN IF NOT EXISTS last_modified text",
+        },
+    ],
     "indexes": [
         {"table": "agents", "columns": ["name"], "method": "btree"},
         # For the GIN index, we need a different approach
@@ -218,11 +275,88 @@ SUPABASE_SCHEMA = {
             "name": "idx_agents_description_gin_tsvector",
             "sql": "CREATE INDEX IF NOT EXISTS idx_agents_description_gin_tsvector ON agents USING gin (to_tsvector('english', description))",
         },
-        {"table": "agents", "columns": ["did"], "method": "btree"},
+        # Trigram index so name/description ILIKE search avoids a sequential scan
+        {
+            "table": "agents",
+            "name": "idx_agents_name_description_trgm",
+            "sql": "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_agents_name_description_trgm ON agents USING gin (name gin_trgm_ops, description gin_trgm_ops)",
+        },
         {"table": "api_keys", "columns": ["user_id"], "method": "btree"},
         {"table": "agent_verification", "columns": ["agent_id"], "method": "btree"},
         {"table": "agent_health", "columns": ["agent_id"], "method": "btree"},
-        {"table": "agent_health", "columns": ["server_id"], "method": "btree"},
+        # Compound indexes backing the filtered list, count and upsert lookups
+        {
+            "table": "agents",
+            "name": "idx_agents_created_id",
+            "sql": "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_agents_created_id ON agents (created_at DESC, id DESC)",
+        },
+        {
+            "table": "api_keys",
+            "name": "idx_api_keys_user_created_id",
+            "sql": "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_api_keys_user_created_id ON api_keys (user_id, created_at DESC, id DESC)",
+        },
+        {
+            "table": "agents",
+            "name": "idx_agents_registry_created",
+            "sql": "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_agents_registry_created ON agents (registry_id, created_at DESC, id DESC)",
+        },
+        # Conflict target of the federated agent upsert; it can't be partial.
+        # NULL federation_ids never conflict, so local agents are unaffected
+        {
+            "table": "agents",
+            "name": "idx_agents_registry_federation",
+            "sql": "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_agents_registry_federation ON agents (registry_id, federation_id)",
+        },
+        {
+            "table": "federated_registries",
+            "name": "idx_federated_registries_created_id",
+            "sql": "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_federated_registries_created_id ON federated_registries (created_at DESC, id DESC)",
+        },
+        {
+            "table": "agent_health",
+            "name": "idx_agent_health_agent_server",
+            "sql": "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_agent_health_agent_server ON agent_health (agent_id, server_id)",
+        },
+        {
+            "table": "agent_health",
+            "name": "idx_agent_health_server",
+            "sql": "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_agent_health_server ON agent_health (server_id, last_ping_at DESC)",
+        },
+    ],
+    "functions": [
+        {
+            # One row per agent with its servers aggregated, most recently
+            # pinged first and capped at max_rows; called through RPC
+            "name": "agent_health_summary",
+            "sql": """CREATE OR REPLACE FUNCTION agent_health_summary(max_rows integer DEFAULT 1000)
+RETURNS TABLE (
+    agent_id uuid,
+    agent_name text,
+    servers jsonb,
+    status text,
+    last_ping_at timestamp with time zone
+)
+LANGUAGE sql STABLE AS $$
+    SELECT
+        h.agent_id,
+        COALESCE(a.name, 'Unknown'),
+        jsonb_agg(
+            jsonb_build_object(
+                'server_id', h.server_id,
+                'status', h.status,
+                'last_ping_at', h.last_ping_at,
+                'metadata', h.metadata
+            )
+        ),
+        CASE WHEN bool_or(h.status = 'active') THEN 'active' ELSE 'inactive' END,
+        max(h.last_ping_at)
+    FROM agent_health h
+    LEFT JOIN agents a ON a.id = h.agent_id
+    GROUP BY h.agent_id, a.name
+    ORDER BY max(h.last_ping_at) DESC
+    LIMIT max_rows
+$$""",
+        },
     ],
     "policies": [
         {
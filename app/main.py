@@ -2,13 +2,18 @@
 
 import os
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 from loguru import logger
 
 from app.api.routes import agents, federated_registries, tokens, health
+from app.core import auth_lastused
+from app.core.auth import get_current_user_from_api_key
+from app.db.client import get_pool_stats
+from app.utils.supabase_utils import SupabaseClient, close_connection_pool
 from app.utils.typesense_utils import TypesenseClient
 
 # Load environment variables
@@ -22,6 +27,9 @@ APP_VERSION = "0.1.0"
 # CORS settings
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(",")
 
+# Expose diagnostic endpoints such as /debug/pool; keep off in production
+DEBUG_ENDPOINTS = os.getenv("DEBUG_ENDPOINTS", "false").lower() == "true"
+
 
 # Lifespan context manager for startup/shutdown events
 @asynccontextmanager
@@ -41,12 +49,18 @@ async def lifespan(app: FastAPI):
             logger.warning("⚠️ Typesense initialization skipped or failed")
     except Exception as e:
         logger.error(f"❌ Error during startup: {str(e)}")
-    
+
+    # Batch API key last_used_at writes in the background
+    auth_lastused.start_flusher()
+
     yield  # Application runs here
     
     # Shutdown logic
     try:
-        # Add any cleanup logic here if needed
+        # Write any buffered API key usage before exiting
+        await auth_lastused.stop_flusher()
+        # Release pooled database connections
+        close_connection_pool(SupabaseClient.get_client())
         logger.info("✅ Shutdown complete")
     except Exception as e:
         logger.error(f"❌ Error during shutdown: {str(e)}")
@@ -70,6 +84,9 @@ def create_application() -> FastAPI:
         allow_headers=["*"],
     )
 
+    # Compress larger responses such as paginated lists
+    app.add_middleware(GZipMiddleware, minimum_size=1024)
+
     # Include routers
     app.include_router(agents.router)
     app.include_router(federated_registries.router)
@@ -99,6 +116,13 @@ def create_application() -> FastAPI:
             },
         }
 
+    # Database connection pool utilization
+    if DEBUG_ENDPOINTS:
+
+        @app.get("/debug/pool")
+        async def debug_pool(current_user=Depends(get_current_user_from_api_key)):
+            return get_pool_stats()
+
     return app
 
 
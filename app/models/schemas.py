@@ -40,7 +40,7 @@ class ApiKey(ApiKeyBase):
 
     id: str
     user_id: str
-    key: str
+    key: Optional[str] = None
     created_at: datetime
     last_used_at: Optional[datetime] = None
     status: str = "active"
@@ -59,7 +59,7 @@ class ApiKeyResponse(BaseModel):
 
     id: str
     name: str
-    key: str
+    key: Optional[str] = None  # Only returned when the key is created
     created_at: datetime
     expires_at: Optional[datetime] = None
     description: Optional[str] = None
@@ -257,6 +257,7 @@ class PaginationMetadata(BaseModel):
     page: int
     page_size: int
     total_pages: int
+    next_cursor: Optional[str] = None
 
 
 # Pagination Response Model
@@ -0,0 +1,67 @@
+"""In-process response caching for read-heavy API endpoints."""
+
+import functools
+import inspect
+from typing import Any, Callable, Dict, Iterable, Tuple
+
+from cachetools import TTLCache
+
+# Namespace -> cache of endpoint responses
+_response_caches: Dict[str, TTLCache] = {}
+
+
+def cached_response(
+    namespace: str, ttl: int, key_params: Iterable[str] = (), maxsize: int = 256
+) -> Callable:
+    """
+    Cache the result of an async endpoint for a short period of time.
+
+    Responses are keyed by the values of ``key_params`` only, so dependencies
+    such as the current user never leak into the key and every caller within
+    the TTL window is served the same response.
+
+    Args:
+        namespace: Name used to group entries so they can be invalidated together
+        ttl: Number of seconds a cached response stays valid
+        key_params: Keyword arguments of the endpoint that make up the cache key
+        maxsize: Maximum number of entries kept for the namespace
+
+    Returns:
+        Decorator wrapping the endpoint
+    """
+    cache = _response_caches.setdefault(namespace, TTLCache(maxsize=maxsize, ttl=ttl))
+    key_params = tuple(key_params)
+
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            bound = signature.bind_partial(*args, **kwargs).arguments
+            key: Tuple[Any, ...] = tuple(bound.get(name) for name in key_params)
+            try:
+                return cache[key]
+            except KeyError:
+                pass
+
+            result = await func(*args, **kwargs)
+            cache[key] = result
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def clear_response_cache(namespace: str = None) -> None:
+    """
+    Invalidate cached responses.
+
+    Args:
+        namespace: Namespace to clear; all namespaces are cleared when omitted
+    """
+    if namespace is None:
+        for cache in _response_caches.values():
+            cache.clear()
+    elif namespace in _response_caches:
+        _response_caches[namespace].clear()
@@ -0,0 +1,79 @@
+"""Opaque cursors for keyset pagination over (created_at, id)."""
+
+import base64
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+import orjson
+from dateutil.parser import isoparse
+
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """
+    Encode the position of a row as an opaque pagination cursor.
+
+    Args:
+        row: The last row of a page, with created_at and id fields
+
+    Returns:
+        URL-safe cursor string pointing just after the row
+    """
+    payload = orjson.dumps({"ts": str(row["created_at"]), "id": str(row["id"])})
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    Decode a pagination cursor.
+
+    Args:
+        cursor: Cursor previously returned by encode_cursor
+
+    Returns:
+        Tuple of (created_at, id) of the row the cursor points after
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    # Both values end up inside a PostgREST filter, so only accept a real
+    # timestamp and UUID and hand back their canonical forms
+    try:
+        payload = orjson.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return isoparse(payload["ts"]).isoformat(), str(uuid.UUID(payload["id"]))
+    except (ValueError, TypeError, KeyError, AttributeError) as e:
+        raise ValueError(f"Invalid pagination cursor: {cursor}") from e
+
+
+def keyset_last(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Find the row a cursor should point after, whatever order a page is shown in.
+
+    Args:
+        rows: Rows of a page fetched in (created_at, id) descending order
+
+    Returns:
+        The row that comes last in (created_at, id) descending order
+    """
+
+    def position(row: Dict[str, Any]) -> Tuple[datetime, uuid.UUID]:
+        created_at = row["created_at"]
+        if not isinstance(created_at, datetime):
+            created_at = isoparse(str(created_at))
+        return created_at, uuid.UUID(str(row["id"]))
+
+    return min(rows, key=position)
+
+
+def keyset_filter(cursor: str) -> str:
+    """
+    Build a PostgREST filter selecting rows after a cursor in descending order.
+
+    Args:
+        cursor: Cursor previously returned by encode_cursor
+
+    Returns:
+        Filter string for the query's or_() method
+    """
+    ts, row_id = decode_cursor(cursor)
+    return f'created_at.lt."{ts}",and(created_at.eq."{ts}",id.lt."{row_id}")'
@@ -1,9 +1,10 @@
 """Utilities for searching and managing agents in the system."""
 
-import math
+import asyncio
 from typing import Dict, Optional, Any
 from loguru import logger
 from app.db.client import Database
+from app.utils.cursor_utils import encode_cursor, keyset_last
 from app.utils.typesense_utils import TypesenseClient
 from app.utils.did_utils import DIDManager, MltsProtocolHandler
 from fastapi import HTTPException, status
@@ -14,6 +15,7 @@ async def search_agents(
     is_team: Optional[bool] = None,
     page: int = 1,
     page_size: int = 20,
+    cursor: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
     Search for agents with hybrid search using Typesense and database.
@@ -23,6 +25,7 @@ async def search_agents(
         is_team: Optional team filter
         page: Page number (starting from 1)
         page_size: Number of items per page
+        cursor: Optional keyset cursor from a previous page; overrides page
 
     Returns:
         Paginated response with agents and metadata
@@ -71,6 +74,9 @@ async def search_agents(
             # Fall back to database search if Typesense fails
             agent_ids = None
 
+    # Fall back to an indexed database text search if Typesense was unavailable
+    db_search = search if search and agent_ids is None else None
+
     # Get agents from database (with or without agent_ids filter)
     agents = await Database.list_agents(
         limit=page_size,
@@ -78,6 +84,8 @@ async def search_agents(
         verification_data_required=False,
         is_team=is_team,
         agent_ids=agent_ids,
+        cursor=cursor,
+        search=db_search,
     )
 
     # Get total count for pagination if not search or if search failed
@@ -87,11 +95,11 @@ async def search_agents(
     else:
         # Get count from database for normal listing
         total_count = await Database.count_agents(
-            registry_id=None if not is_team else is_team
+            registry_id=None if not is_team else is_team, search=db_search
         )
 
     # Calculate total pages
-    total_pages = math.ceil(total_count / page_size) if total_count > 0 else 0
+    total_pages = (total_count + page_size - 1) // page_size if page_size else 0
 
     # Construct paginated response
     response = {
@@ -101,6 +109,13 @@ async def search_agents(
             "page": page,
             "page_size": page_size,
             "total_pages": total_pages,
+            # Agents are reordered by health within the page, so point the
+            # cursor at the page's last row in keyset order
+            "next_cursor": (
+                encode_cursor(keyset_last(agents))
+                if len(agents) == page_size
+                else None
+            ),
         },
     }
 
@@ -164,11 +179,7 @@ async def create_agent_with_verification(
 
     # Validate team members if this is a team
     if agent_data.get("is_team") and agent_data.get("members"):
-        invalid_members = []
-        for member_id in agent_data["members"]:
-            member = await Database.get_agent(member_id)
-            if not member:
-                invalid_members.append(member_id)
+        invalid_members = await Database.get_missing_agent_ids(agent_data["members"])
 
         if invalid_members:
             raise HTTPException(
@@ -180,13 +191,9 @@ async def create_agent_with_verification(
         # Create agent record
         created_agent = await Database.create_agent(agent_data)
 
-        # Create agent record in Typesense
-        typesense_record_created = await TypesenseClient.create_agent(created_agent)
-        if not typesense_record_created:
-            logger.error(
-                f"Failed to create agent record in Typesense for agent ID: {created_agent['id']}"
-            )
-            # Consider whether to fail or continue - currently continuing
+        # Indexing and storing verification only need the new agent id, so
+        # run them together instead of one after the other
+        pending = [TypesenseClient.create_agent(created_agent)]
 
         # Store verification data if complete
         if verification_data.get("did") and verification_data.get("public_key"):
@@ -197,13 +204,20 @@ async def create_agent_with_verification(
                     "key_type": "rsa",
                 }
             )
-            await Database.create_agent_verification(verification_data)
+            pending.append(Database.create_agent_verification(verification_data))
+
+        typesense_record_created, *_ = await asyncio.gather(*pending)
+        if not typesense_record_created:
+            logger.error(
+                f"Failed to create agent record in Typesense for agent ID: {created_agent['id']}"
+            )
+            # Consider whether to fail or continue - currently continuing
 
         # Return result with private key if generated
         result = created_agent
         if "private_key" in response_data:
-            if hasattr(created_agent, "dict"):
-                agent_dict = created_agent.dict()
+            if hasattr(created_agent, "model_dump"):
+                agent_dict = created_agent.model_dump()
             else:
                 agent_dict = created_agent
             result = {**agent_dict, **response_data}
@@ -248,11 +262,7 @@ async def update_agent_with_typesense(
 
     # Validate team members if this is a team and members are being updated
     if update_data.get("members"):
-        invalid_members = []
-        for member_id in update_data["members"]:
-            member = await Database.get_agent(member_id)
-            if not member:
-                invalid_members.append(member_id)
+        invalid_members = await Database.get_missing_agent_ids(update_data["members"])
 
         if invalid_members:
             raise HTTPException(
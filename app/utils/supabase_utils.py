@@ -1,9 +1,11 @@
 """Utilities for interacting with Supabase database service."""
 
 import os
-import json
 import logging
 from typing import Dict, List, Optional, Any, Callable
+import httpx
+import orjson
+from postgrest.exceptions import APIError
 from supabase import create_client, Client
 from dotenv import load_dotenv
 
@@ -21,6 +23,17 @@ FEDERATED_REGISTRIES_TABLE = "federated_registries"
 AGENT_HEALTH_TABLE = "agent_health"
 AGENT_VERIFICATION_TABLE = "agent_verification"
 
+# Connection pool for the PostgREST HTTP session. Start around
+# 2 * min(cpu_count, concurrent requests per worker) and tune from /debug/pool
+# (enabled with DEBUG_ENDPOINTS=true).
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+# Seconds an idle pooled connection is kept open before it is closed
+DB_POOL_IDLE_TIMEOUT = float(os.getenv("DB_POOL_IDLE_TIMEOUT", "60"))
+
+# Multiplex PostgREST requests over HTTP/2 (requires the "http2" extra)
+DB_HTTP2 = os.getenv("DB_HTTP2", "false").lower() == "true"
+
 # JSON fields that need parsing/serialization
 AGENT_JSON_FIELDS = ["capabilities", "metadata", "links", "dependencies"]
 
@@ -65,12 +78,46 @@ class SupabaseClient:
         else:
             try:
                 SupabaseClient._client = create_client(supabase_url, supabase_key)
+                configure_connection_pool(SupabaseClient._client)
                 logger.info(f"Supabase client initialized with URL: {supabase_url}")
             except Exception as e:
                 logger.error(f"Failed to initialize Supabase client: {str(e)}")
                 SupabaseClient._client = None
 
 
+def configure_connection_pool(client: Client) -> None:
+    """
+    Replace the client's PostgREST session with one using a sized connection pool.
+
+    Args:
+        client: The Supabase client whose database session should be pooled
+    """
+    session = client.postgrest.session
+    client.postgrest.session = type(session)(
+        base_url=session.base_url,
+        headers=session.headers,
+        timeout=session.timeout,
+        http2=DB_HTTP2,
+        limits=httpx.Limits(
+            max_connections=DB_POOL_SIZE + DB_MAX_OVERFLOW,
+            max_keepalive_connections=DB_POOL_SIZE,
+            keepalive_expiry=DB_POOL_IDLE_TIMEOUT,
+        ),
+    )
+    session.close()
+
+
+def close_connection_pool(client: Optional[Client]) -> None:
+    """
+    Close the PostgREST session and its pooled connections.
+
+    Args:
+        client: The Supabase client to close, or None if not configured
+    """
+    if client is not None:
+        client.postgrest.session.close()
+
+
 def parse_json_fields(
     data: Dict[str, Any], fields: List[str] = AGENT_JSON_FIELDS
 ) -> Dict[str, Any]:
@@ -89,37 +136,14 @@ def parse_json_fields(
     for field in fields:
         if field in result and isinstance(result[field], str):
             try:
-                result[field] = json.loads(result[field])
-            except json.JSONDecodeError:
+                result[field] = orjson.loads(result[field])
+            except orjson.JSONDecodeError:
                 # Keep as string if parsing fails
                 pass
 
     return result
 
 
-def serialize_json_fields(
-    data: Dict[str, Any], fields: List[str] = AGENT_JSON_FIELDS
-) -> Dict[str, Any]:
-    """
-    Serialize fields to JSON strings for storage in Supabase.
-
-    Args:
-        data: The data dictionary containing fields to serialize
-        fields: List of field names that should be serialized to JSON
-
-    Returns:
-        Dict with fields serialized to JSON strings
-    """
-    result = data.copy()
-
-    for field in fields:
-        if field in result and result[field] is not None:
-            if not isinstance(result[field], str):
-                result[field] = json.dumps(result[field])
-
-    return result
-
-
 def execute_query(query_fn: Callable, error_message: str = "Database query failed"):
     """
     Execute a Supabase query and handle common error cases.
@@ -138,9 +162,7 @@ def execute_query(query_fn: Callable, error_message: str = "Database query faile
     if client is None:
         raise Exception("Supabase client not initialized")
 
-    response = query_fn(client)
-
-    if hasattr(response, "error") and response.error:
-        raise Exception(f"{error_message}: {response.error.message}")
-
-    return response
+    try:
+        return query_fn(client)
+    except APIError as e:
+        raise Exception(f"{error_message}: {e.message}") from e
@@ -4,9 +4,11 @@ This module provides an abstraction layer for Typesense operations.
 """
 
 import os
-import json
+import orjson
 import logging
+from datetime import datetime, timezone
 from typing import Dict, Any, List, Optional
+from dateutil.parser import isoparse
 import typesense
 from typesense.exceptions import TypesenseClientError
 from dotenv import load_dotenv
@@ -538,8 +540,8 @@ class TypesenseClient:
             # Ensure domains is a list
             if isinstance(agent["domains"], str):
                 try:
-                    document["domains"] = json.loads(agent["domains"])
-                except json.JSONDecodeError:
+                    document["domains"] = orjson.loads(agent["domains"])
+                except orjson.JSONDecodeError:
                     document["domains"] = [agent["domains"]]
             else:
                 document["domains"] = agent["domains"]
@@ -548,8 +550,8 @@ class TypesenseClient:
             # Ensure tags is a list
             if isinstance(agent["tags"], str):
                 try:
-                    document["tags"] = json.loads(agent["tags"])
-                except json.JSONDecodeError:
+                    document["tags"] = orjson.loads(agent["tags"])
+                except orjson.JSONDecodeError:
                     document["tags"] = [agent["tags"]]
             else:
                 document["tags"] = agent["tags"]
@@ -561,40 +563,36 @@ class TypesenseClient:
             document["mode"] = "collaborate"
 
         # Convert timestamp strings to unix timestamps (int64)
-        if "created_at" in agent and agent["created_at"]:
-            if isinstance(agent["created_at"], str):
-                try:
-                    # Convert ISO format string to unix timestamp (seconds)
-                    from datetime import datetime
-
-                    dt = datetime.fromisoformat(
-                        agent["created_at"].replace("Z", "+00:00")
-                    )
-                    document["created_at"] = int(dt.timestamp())
-                except (ValueError, TypeError):
-                    # If conversion fails, use current timestamp
-                    document["created_at"] = int(datetime.now().timestamp())
-            elif isinstance(agent["created_at"], (int, float)):
-                document["created_at"] = int(agent["created_at"])
-
-        if "updated_at" in agent and agent["updated_at"]:
-            if isinstance(agent["updated_at"], str):
-                try:
-                    # Convert ISO format string to unix timestamp (seconds)
-                    from datetime import datetime
-
-                    dt = datetime.fromisoformat(
-                        agent["updated_at"].replace("Z", "+00:00")
-                    )
-                    document["updated_at"] = int(dt.timestamp())
-                except (ValueError, TypeError):
-                    # If conversion fails, use current timestamp
-                    document["updated_at"] = int(datetime.now().timestamp())
-            elif isinstance(agent["updated_at"], (int, float)):
-                document["updated_at"] = int(agent["updated_at"])
+        for field in ("created_at", "updated_at"):
+            if agent.get(field):
+                timestamp = _to_unix_timestamp(agent[field])
+                if timestamp is not None:
+                    document[field] = timestamp
 
         return document
 
 
+def _to_unix_timestamp(value: Any) -> Optional[int]:
+    """
+    Convert a stored timestamp to unix seconds for the search index.
+
+    Args:
+        value: ISO 8601 string or numeric unix timestamp
+
+    Returns:
+        Unix timestamp in seconds, the current time if the string cannot be
+        parsed, or None for unsupported types
+    """
+    if isinstance(value, str):
+        try:
+            return int(isoparse(value).timestamp())
+        except ValueError:
+            # If conversion fails, use current timestamp
+            return int(datetime.now(timezone.utc).timestamp())
+    if isinstance(value, (int, float)):
+        return int(value)
+    return None
+
+
 # Initialize the client when the module is imported
 typesense_client = TypesenseClient.get_client()
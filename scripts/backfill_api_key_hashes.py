@@ -0,0 +1,143 @@
+"""Script for backfilling hashed API keys in the Hibiscus backend system.
+
+API keys are looked up by their BLAKE2b hash and raw keys are no longer
+stored. Keys created before the key_hash column existed must be hashed once
+with this script, or they will no longer authenticate. The script also clears
+the raw key of every row it hashes.
+"""
+
+import os
+from dotenv import load_dotenv
+import typer
+from rich.console import Console
+from rich.panel import Panel
+from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn
+from postgrest.exceptions import APIError
+from supabase import create_client, Client
+
+from app.db.client import hash_api_key
+
+# Initialize Typer app and Rich console
+app = typer.Typer(help="Hibiscus Agent Registry Admin Tools")
+console = Console()
+
+# Load environment variables
+load_dotenv()
+
+# Table names
+API_KEYS_TABLE = "api_keys"
+
+# Number of keys written per upsert request
+BATCH_SIZE = 500
+
+# Initialize Supabase client
+# For admin operations, we need to use the service_role key to bypass RLS
+supabase_url = os.getenv("SUPABASE_URL")
+supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY", os.getenv("SUPABASE_KEY"))
+
+if not supabase_url or not supabase_key:
+    console.print(
+        "[bold red]Error: Missing Supabase credentials. Set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY in .env file.[/bold red]"
+    )
+    exit(1)
+
+# Connect with service role to bypass RLS
+supabase: Client = create_client(supabase_url, supabase_key)
+
+
+@app.command()
+def backfill_api_key_hashes():
+    """Hash every API key that is still stored in plaintext."""
+    console.print(
+        Panel.fit(
+            "[bold green]Hibiscus Agent Registry[/bold green]\nAPI Key Hash Backfill",
+            title="🌺 Hibiscus",
+            border_style="green",
+        )
+    )
+
+    def unhashed_keys(columns, **kwargs):
+        return (
+            supabase.table(API_KEYS_TABLE)
+            .select(columns, **kwargs)
+            .not_.is_("key", "null")
+        )
+
+    try:
+        total = unhashed_keys("id", count="exact").limit(1).execute().count
+    except APIError as e:
+        console.print(f"[bold red]Error counting API keys: {e.message}[/bold red]")
+        raise typer.Exit(code=1)
+
+    hashed = 0
+    failed = 0
+    last_id = None
+    with Progress(
+        SpinnerColumn(),
+        TextColumn("[bold blue]{task.description}"),
+        BarColumn(),
+        TextColumn("[bold]{task.fields[status]}"),
+        console=console,
+    ) as progress:
+        task = progress.add_task(
+            "[yellow]Hashing API keys...", total=total, status="Starting"
+        )
+
+        # Page by id until nothing is left: PostgREST caps every response at
+        # its max-rows setting, which may be below BATCH_SIZE, and keys that
+        # fail to write stay unhashed, so offsets would shift
+        while True:
+            query = (
+                unhashed_keys("id, user_id, name, key")
+                .order("id")
+                .limit(BATCH_SIZE)
+            )
+            if last_id is not None:
+                query = query.gt("id", last_id)
+            try:
+                batch = query.execute().data
+            except APIError as e:
+                console.print(
+                    f"[bold red]Error fetching API keys: {e.message}[/bold red]"
+                )
+                raise typer.Exit(code=1)
+
+            if not batch:
+                break
+            last_id = batch[-1]["id"]
+
+            # Upsert on id so each batch is written in one request; user_id and
+            # name are carried along because they are required on insert
+            rows = [
+                {
+                    "id": row["id"],
+                    "user_id": row["user_id"],
+                    "name": row["name"],
+                    "key_hash": hash_api_key(row["key"]),
+                    "key": None,
+                }
+                for row in batch
+            ]
+            try:
+                (
+                    supabase.table(API_KEYS_TABLE)
+                    .upsert(rows, on_conflict="id", returning="minimal")
+                    .execute()
+                )
+                hashed += len(batch)
+            except APIError:
+                failed += len(batch)
+
+            progress.update(task, advance=len(batch), status=f"{failed} failed")
+
+    if failed:
+        console.print(
+            f"[bold yellow]⚠️ Hashed {hashed} out of {hashed + failed} API keys[/bold yellow]"
+        )
+        raise typer.Exit(code=1)
+
+    console.print(f"[bold green]✅ Hashed {hashed} API keys[/bold green]")
+
+
+if __name__ == "__main__":
+    app()
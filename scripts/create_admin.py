@@ -15,6 +15,8 @@ from rich.panel import Panel
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn
 from supabase import create_client, Client
 
+from app.db.client import hash_api_key
+
 # Initialize Typer app and Rich console
 app = typer.Typer(help="Hibiscus Agent Registry Admin Tools")
 console = Console()
@@ -48,7 +50,7 @@ async def create_initial_admin(email: str, name: str, expire_days: int = 365) ->
     key_id = str(uuid.uuid4())
 
     # Generate API key
-    api_key = secrets.token_hex(32)
+    api_key = secrets.token_urlsafe(32)
     now = datetime.now(timezone.utc).isoformat()
 
     # Create user record
@@ -64,7 +66,7 @@ async def create_initial_admin(email: str, name: str, expire_days: int = 365) ->
     key_data = {
         "id": key_id,
         "user_id": user_id,
-        "key": api_key,
+        "key_hash": hash_api_key(api_key),
         "name": "Initial Admin Key",
         "description": "Auto-generated initial admin key",
         "created_at": now,
@@ -95,6 +95,16 @@ async def create_tables():
             return
 
     try:
+        # Enable extensions required by tables and indexes
+        for extension in SUPABASE_SCHEMA.get("extensions", []):
+            try:
+                await conn.execute(f"CREATE EXTENSION IF NOT EXISTS {extension}")
+                console.print(
+                    f"[bold green]✅ Extension {extension} enabled[/bold green]"
+                )
+            except Exception as e:
+                logger.error(f"Failed to enable extension {extension}: {str(e)}")
+
         # Create tables section
         console.print(
             Panel(
@@ -195,6 +205,16 @@ async def create_tables():
                 f"[bold yellow]⚠️ Created {success_count} out of {table_count} tables[/bold yellow]"
             )
 
+        # Apply data and index migrations before indexes depend on them
+        for migration in SUPABASE_SCHEMA.get("migrations", []):
+            try:
+                await conn.execute(migration["sql"])
+                console.print(
+                    f"[bold green]✅ Migration {migration['name']} applied[/bold green]"
+                )
+            except Exception as e:
+                logger.error(f"Failed to apply migration {migration['name']}: {str(e)}")
+
         # Create indexes section
         console.print("\n")
         console.print(
@@ -275,6 +295,16 @@ async def create_tables():
                 f"[bold yellow]⚠️ Created {index_success_count} out of {index_count} indexes[/bold yellow]"
             )
 
+        # Create SQL functions exposed through PostgREST RPC
+        for function in SUPABASE_SCHEMA.get("functions", []):
+            try:
+                await conn.execute(function["sql"])
+                console.print(
+                    f"[bold green]✅ Function {function['name']} created[/bold green]"
+                )
+            except Exception as e:
+                logger.error(f"Failed to create function {function['name']}: {str(e)}")
+
         # Create RLS policies section
         console.print("\n")
         console.print(
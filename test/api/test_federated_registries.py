@@ -1,9 +1,28 @@
+import json
 import pytest
 import uuid
 from unittest import mock
 from datetime import datetime, timezone
 
 
+class MockStreamResponse:
+    """Minimal stand-in for the response yielded by httpx.AsyncClient.stream."""
+
+    def __init__(self, payload, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._body = json.dumps(payload).encode()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def aiter_bytes(self):
+        yield self._body
+
+
 # Simple test for standalone execution
 def test_basic():
     """Simple test to ensure pytest is working"""
@@ -320,13 +339,9 @@ async def test_sync_registry_agents_with_pagination(mock_database, monkeypatch):
         async def __aexit__(self, *args):
             pass
 
-        async def get(self, url, headers=None, **kwargs):
+        def stream(self, method, url, headers=None, **kwargs):
             self.get_calls.append((url, headers, kwargs))
-
-            response = mock.MagicMock()
-            response.status_code = 200
-            response.json.return_value = mock_response
-            return response
+            return MockStreamResponse(mock_response)
 
     # Set up the mock client
     mock_client = MockHTTPClient()
@@ -334,15 +349,11 @@ async def test_sync_registry_agents_with_pagination(mock_database, monkeypatch):
     # Mock database calls
     create_agent_calls = []
 
-    async def mock_get_agent_by_federation_id(federation_id, registry_id):
-        # No agent exists yet
-        return None
+    async def mock_upsert_federated_agents(agents, registry_id):
+        create_agent_calls.extend(agents)
+        return [{"id": str(uuid.uuid4()), **agent_data} for agent_data in agents]
 
-    async def mock_create_federated_agent(agent_data):
-        create_agent_calls.append(agent_data)
-        return {"id": str(uuid.uuid4()), **agent_data}
-
-    async def mock_update_registry_sync_time(registry_id):
+    async def mock_update_registry_sync_time(registry_id, **kwargs):
         return {
             "id": registry_id,
             "last_synced_at": datetime.now(timezone.utc).isoformat(),
@@ -355,11 +366,8 @@ async def test_sync_registry_agents_with_pagination(mock_database, monkeypatch):
             return_value=mock_client,
         ),
         mock.patch(
-            "app.db.client.Database.get_agent_by_federation_id",
-            mock_get_agent_by_federation_id,
-        ),
-        mock.patch(
-            "app.db.client.Database.create_federated_agent", mock_create_federated_agent
+            "app.db.client.Database.upsert_federated_agents",
+            mock_upsert_federated_agents,
         ),
         mock.patch(
             "app.db.client.Database.update_federated_registry_sync_time",
@@ -445,35 +453,24 @@ async def test_sync_registry_agents_with_verification_data(mock_database, monkey
         async def __aexit__(self, *args):
             pass
 
-        async def get(self, *args, **kwargs):
+        def stream(self, *args, **kwargs):
             self.get_calls.append((args, kwargs))
-
-            response = mock.MagicMock()
-            response.status_code = 200
-            response.json.return_value = mock_response_data
-            return response
+            return MockStreamResponse(mock_response_data)
 
     # Set up the mock client
     mock_client = MockHTTPClient()
 
     # Track database calls
-    agent_by_federation_calls = []
     create_agent_calls = []
     create_verification_calls = []
 
     # Mock database methods
-    async def mock_get_agent_by_federation_id(federation_id, registry_id):
-        agent_by_federation_calls.append((federation_id, registry_id))
-        # No agent exists yet
-        return None
-
-    async def mock_create_federated_agent(agent_data):
-        create_agent_calls.append(agent_data)
-        # Exclude verification data when creating agent
-        data_without_verification = {
-            k: v for k, v in agent_data.items() if k != "verification"
-        }
-        return {"id": agent_id, **data_without_verification}
+    async def mock_upsert_federated_agents(agents, registry_id):
+        create_agent_calls.extend(agents)
+        return [
+            {"id": agent_id, "federation_id": agent_data["id"]}
+            for agent_data in agents
+        ]
 
     async def mock_create_agent_verification(verification_data):
         create_verification_calls.append(verification_data)
@@ -486,11 +483,8 @@ async def test_sync_registry_agents_with_verification_data(mock_database, monkey
             return_value=mock_client,
         ),
         mock.patch(
-            "app.db.client.Database.get_agent_by_federation_id",
-            mock_get_agent_by_federation_id,
-        ),
-        mock.patch(
-            "app.db.client.Database.create_federated_agent", mock_create_federated_agent
+            "app.db.client.Database.upsert_federated_agents",
+            mock_upsert_federated_agents,
         ),
         mock.patch(
             "app.db.client.Database.create_agent_verification",
@@ -506,7 +500,6 @@ async def test_sync_registry_agents_with_verification_data(mock_database, monkey
 
         # Debugging info
         print(f"HTTP GET calls: {len(mock_client.get_calls)}")
-        print(f"get_agent_by_federation_id calls: {len(agent_by_federation_calls)}")
         print(f"Create agent calls: {len(create_agent_calls)}")
 
         # Check if agent was created
@@ -572,7 +565,7 @@ async def test_sync_registry_failure_handling(mock_database, monkeypatch):
         async def __aexit__(self, *args):
             pass
 
-        async def get(self, *args, **kwargs):
+        def stream(self, *args, **kwargs):
             # Simulate connection error
             raise httpx.HTTPError("Connection failed")
 
@@ -580,8 +573,7 @@ async def test_sync_registry_failure_handling(mock_database, monkeypatch):
     mock_client = MockHTTPClient()
 
     # Track if database methods are called
-    get_agent_spy = mock.AsyncMock()
-    create_agent_spy = mock.AsyncMock()
+    upsert_spy = mock.AsyncMock()
     update_sync_time_spy = mock.AsyncMock()
 
     # Apply monkeypatches
@@ -590,8 +582,7 @@ async def test_sync_registry_failure_handling(mock_database, monkeypatch):
             "app.api.routes.federated_registries.httpx.AsyncClient",
             return_value=mock_client,
         ),
-        mock.patch("app.db.client.Database.get_agent_by_federation_id", get_agent_spy),
-        mock.patch("app.db.client.Database.create_federated_agent", create_agent_spy),
+        mock.patch("app.db.client.Database.upsert_federated_agents", upsert_spy),
         mock.patch(
             "app.db.client.Database.update_federated_registry_sync_time",
             update_sync_time_spy,
@@ -602,8 +593,7 @@ async def test_sync_registry_failure_handling(mock_database, monkeypatch):
         await sync_registry_agents(registry)
 
         # Verify no database calls were made due to the HTTP error
-        get_agent_spy.assert_not_called()
-        create_agent_spy.assert_not_called()
+        upsert_spy.assert_not_called()
 
         # The actual implementation doesn't update sync time on error
         update_sync_time_spy.assert_not_called()
@@ -1,3 +1,4 @@
+import asyncio
 import json
 import pytest
 import uuid
@@ -11,8 +12,30 @@ from app.api.routes.federated_registries import (
     sync_federated_registry,
     list_federated_registry_agents,
     sync_registry_agents,
+    SYNC_CONCURRENCY,
 )
 from app.models.schemas import FederatedRegistryCreate
+from app.utils.cursor_utils import encode_cursor
+
+
+class MockStreamResponse:
+    """Minimal stand-in for the response yielded by httpx.AsyncClient.stream."""
+
+    def __init__(self, payload, status_code=200, chunk_size=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._body = json.dumps(payload).encode()
+        self._chunk_size = chunk_size or len(self._body)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def aiter_bytes(self):
+        for i in range(0, len(self._body), self._chunk_size):
+            yield self._body[i : i + self._chunk_size]
 
 
 # Test listing federated registries with pagination
@@ -36,7 +59,7 @@ async def test_list_federated_registries_pagination(monkeypatch):
     async def mock_count_registries():
         return len(mock_registries)
 
-    async def mock_list_registries(limit=20, offset=0):
+    async def mock_list_registries(limit=20, offset=0, cursor=None):
         return mock_registries[offset : offset + limit]
 
     # Apply mocks
@@ -63,6 +86,7 @@ async def test_list_federated_registries_pagination(monkeypatch):
         assert len(result.items) == 10
         assert result.items[0]["name"] == "Registry 1"
         assert result.items[9]["name"] == "Registry 10"
+        assert result.metadata.next_cursor == encode_cursor(result.items[-1])
 
         # Test second page
         result = await list_federated_registries(
@@ -84,6 +108,77 @@ async def test_list_federated_registries_pagination(monkeypatch):
         assert len(result.items) == 5  # Only 5 items left
         assert result.items[0]["name"] == "Registry 21"
         assert result.items[4]["name"] == "Registry 25"
+        assert result.metadata.next_cursor is None
+
+
+@pytest.mark.asyncio
+async def test_list_federated_registries_cached_until_registry_added(monkeypatch):
+    """Test that the registry listing is cached and invalidated on add"""
+    mock_registries = [
+        {
+            "id": str(uuid.uuid4()),
+            "name": "Cached Registry",
+            "url": "https://cached-registry.example.com",
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "last_synced_at": None,
+        }
+    ]
+
+    list_spy = mock.AsyncMock(side_effect=lambda limit, offset, cursor: list(mock_registries))
+    count_spy = mock.AsyncMock(side_effect=lambda: len(mock_registries))
+
+    class MockHTTPClient:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *args):
+            pass
+
+        async def head(self, url, **kwargs):
+            response = mock.MagicMock()
+            response.status_code = 200
+            return response
+
+    async def mock_add_registry(data):
+        created = {
+            "id": str(uuid.uuid4()),
+            **data,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "last_synced_at": None,
+        }
+        mock_registries.append(created)
+        return created
+
+    with (
+        mock.patch("httpx.AsyncClient", return_value=MockHTTPClient()),
+        mock.patch("app.db.client.Database.count_federated_registries", count_spy),
+        mock.patch("app.db.client.Database.list_federated_registries", list_spy),
+        mock.patch("app.db.client.Database.add_federated_registry", mock_add_registry),
+    ):
+        first = await list_federated_registries(
+            page=1, size=10, current_user={"id": "test-user"}
+        )
+        second = await list_federated_registries(
+            page=1, size=10, current_user={"id": "other-user"}
+        )
+
+        # Second call is served from the cache
+        assert second is first
+        assert list_spy.await_count == 1
+
+        await add_federated_registry(
+            registry=FederatedRegistryCreate(
+                name="Fresh Registry", url="https://fresh-registry.example.com"
+            ),
+            current_user={"id": "test-user"},
+        )
+
+        # Adding a registry invalidates the cached listing
+        third = await list_federated_registries(
+            page=1, size=10, current_user={"id": "test-user"}
+        )
+        assert list_spy.await_count == 2
+        assert third.metadata.total == 2
 
 
 # Test adding a new federated registry
@@ -105,9 +200,10 @@ async def test_add_federated_registry_success(monkeypatch):
         async def __aexit__(self, *args):
             pass
 
-        async def get(self, url):
+        async def head(self, url, **kwargs):
             # Simulate successful response
             response = mock.MagicMock()
+            response.status_code = 200
             response.raise_for_status = mock.MagicMock()  # Does nothing (success)
             return response
 
@@ -156,7 +252,7 @@ async def test_add_federated_registry_validation_failure(monkeypatch):
         async def __aexit__(self, *args):
             pass
 
-        async def get(self, url):
+        async def head(self, url, **kwargs):
             # Simulate connection error
             raise httpx.HTTPError("Failed to connect")
 
@@ -173,6 +269,82 @@ async def test_add_federated_registry_validation_failure(monkeypatch):
         assert "Failed to connect" in excinfo.value.detail
 
 
+@pytest.mark.asyncio
+async def test_add_federated_registry_head_not_allowed_falls_back_to_get(monkeypatch):
+    """Test that registries rejecting HEAD are probed with GET instead"""
+    registry = FederatedRegistryCreate(
+        name="GET-only Registry",
+        url="https://get-only-registry.example.com",
+    )
+
+    calls = []
+
+    class MockHTTPClient:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *args):
+            pass
+
+        async def head(self, url, **kwargs):
+            calls.append("HEAD")
+            response = mock.MagicMock()
+            response.status_code = 405
+            return response
+
+        async def get(self, url, **kwargs):
+            calls.append("GET")
+            response = mock.MagicMock()
+            response.status_code = 200
+            response.raise_for_status = mock.MagicMock()
+            return response
+
+    async def mock_add_registry(data):
+        return {"id": str(uuid.uuid4()), **data}
+
+    with (
+        mock.patch("httpx.AsyncClient", return_value=MockHTTPClient()),
+        mock.patch("app.db.client.Database.add_federated_registry", mock_add_registry),
+    ):
+        result = await add_federated_registry(
+            registry=registry, current_user={"id": "test-user"}
+        )
+
+        assert calls == ["HEAD", "GET"]
+        assert result["name"] == "GET-only Registry"
+
+
+@pytest.mark.asyncio
+async def test_add_federated_registry_retries_connect_error_once(monkeypatch):
+    """Test that a single transient connect error is retried before failing"""
+    registry = FederatedRegistryCreate(
+        name="Flaky Registry",
+        url="https://flaky-registry.example.com",
+    )
+
+    attempts = []
+
+    class MockHTTPClient:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *args):
+            pass
+
+        async def head(self, url, **kwargs):
+            attempts.append(url)
+            raise httpx.ConnectError("Connection refused")
+
+    with mock.patch("httpx.AsyncClient", return_value=MockHTTPClient()):
+        with pytest.raises(HTTPException) as excinfo:
+            await add_federated_registry(
+                registry=registry, current_user={"id": "test-user"}
+            )
+
+        assert excinfo.value.status_code == status.HTTP_400_BAD_REQUEST
+        assert len(attempts) == 2
+
+
 @pytest.mark.asyncio
 async def test_sync_federated_registry_background(monkeypatch):
     """Test syncing a federated registry in the background"""
@@ -367,8 +539,16 @@ async def test_list_federated_registry_agents_not_found(monkeypatch):
     async def mock_get_registry(id):
         return None
 
+    # The page is fetched alongside the registry lookup; a failure there must
+    # not hide the 404
+    list_spy = mock.AsyncMock(side_effect=Exception("no such registry"))
+
     # Apply mocks
-    with mock.patch("app.db.client.Database.get_federated_registry", mock_get_registry):
+    with (
+        mock.patch("app.db.client.Database.get_federated_registry", mock_get_registry),
+        mock.patch("app.db.client.Database.count_agents", mock.AsyncMock(return_value=0)),
+        mock.patch("app.db.client.Database.list_agents", list_spy),
+    ):
         # Test listing agents with non-existent registry - should raise exception
         with pytest.raises(HTTPException) as excinfo:
             await list_federated_registry_agents(
@@ -381,6 +561,7 @@ async def test_list_federated_registry_agents_not_found(monkeypatch):
         # Verify exception
         assert excinfo.value.status_code == status.HTTP_404_NOT_FOUND
         assert "Federated registry not found" in excinfo.value.detail
+        list_spy.assert_awaited_once()
 
 
 @pytest.mark.asyncio
@@ -436,36 +617,35 @@ async def test_sync_registry_agents_with_did_verification(monkeypatch):
         async def __aexit__(self, *args):
             pass
 
-        async def get(self, url, headers=None, **kwargs):
+        def stream(self, method, url, headers=None, **kwargs):
             # Return paginated response with agents
-            response = mock.MagicMock()
-            response.status_code = 200
-            response.json.return_value = {
-                "items": remote_agents,
-                "metadata": {
-                    "total": len(remote_agents),
-                    "page": 1,
-                    "page_size": len(remote_agents),
-                    "total_pages": 1,
-                },
-            }
-            return response
+            return MockStreamResponse(
+                {
+                    "items": remote_agents,
+                    "metadata": {
+                        "total": len(remote_agents),
+                        "page": 1,
+                        "page_size": len(remote_agents),
+                        "total_pages": 1,
+                    },
+                }
+            )
 
     # Mock database methods
-    get_agent_calls = []
+    upsert_calls = []
     create_agent_calls = []
     update_sync_time_calls = []
     create_verification_calls = []
 
-    async def mock_get_agent_by_federation_id(federation_id, registry_id):
-        get_agent_calls.append((federation_id, registry_id))
-        return None  # Assume agent doesn't exist
-
-    async def mock_create_federated_agent(agent_data):
-        create_agent_calls.append(agent_data)
-        return {"id": str(uuid.uuid4()), **agent_data}
+    async def mock_upsert_federated_agents(agents, registry_id):
+        upsert_calls.append(registry_id)
+        create_agent_calls.extend(agents)
+        return [
+            {"id": str(uuid.uuid4()), "federation_id": agent_data["id"], **agent_data}
+            for agent_data in agents
+        ]
 
-    async def mock_update_sync_time(registry_id):
+    async def mock_update_sync_time(registry_id, **kwargs):
         update_sync_time_calls.append(registry_id)
         return {
             "id": registry_id,
@@ -480,11 +660,8 @@ async def test_sync_registry_agents_with_did_verification(monkeypatch):
     with (
         mock.patch("httpx.AsyncClient", return_value=MockHTTPClient()),
         mock.patch(
-            "app.db.client.Database.get_agent_by_federation_id",
-            mock_get_agent_by_federation_id,
-        ),
-        mock.patch(
-            "app.db.client.Database.create_federated_agent", mock_create_federated_agent
+            "app.db.client.Database.upsert_federated_agents",
+            mock_upsert_federated_agents,
         ),
         mock.patch(
             "app.db.client.Database.update_federated_registry_sync_time",
@@ -497,13 +674,13 @@ async def test_sync_registry_agents_with_did_verification(monkeypatch):
         # Run the sync function
         await sync_registry_agents(registry)
 
-        # Verify agents were created
+        # Verify agents were upserted in a single batch
+        assert upsert_calls == [registry_id]
         assert len(create_agent_calls) == 5
 
-        # Verify each agent has federation_id from remote and verification data was stored
+        # Verify verification data was split off and stored for each agent
         for i, agent_data in enumerate(create_agent_calls):
-            # Check federation_id was set
-            assert "federation_id" in agent_data
+            assert "verification" not in agent_data
             assert agent_data["name"] == f"Remote Agent {i}"
 
             # Check verification data was correctly processed
@@ -516,3 +693,162 @@ async def test_sync_registry_agents_with_did_verification(monkeypatch):
         # Verify sync time was updated
         assert len(update_sync_time_calls) == 1
         assert update_sync_time_calls[0] == registry_id
+
+
+@pytest.mark.asyncio
+async def test_sync_registry_agents_rejects_oversized_response(monkeypatch):
+    """Test that a remote agent list above the size ceiling is not ingested"""
+    registry = {
+        "id": str(uuid.uuid4()),
+        "name": "Huge Registry",
+        "url": "https://huge-registry.example.com",
+    }
+
+    payload = {"items": [{"id": str(uuid.uuid4()), "name": "x" * 64}] * 8}
+
+    class MockHTTPClient:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *args):
+            pass
+
+        def stream(self, method, url, headers=None, **kwargs):
+            return MockStreamResponse(payload, chunk_size=128)
+
+    upsert_spy = mock.AsyncMock()
+    update_sync_time_spy = mock.AsyncMock()
+
+    with (
+        mock.patch("httpx.AsyncClient", return_value=MockHTTPClient()),
+        mock.patch(
+            "app.api.routes.federated_registries.MAX_REGISTRY_RESPONSE_BYTES", 256
+        ),
+        mock.patch("app.db.client.Database.upsert_federated_agents", upsert_spy),
+        mock.patch(
+            "app.db.client.Database.update_federated_registry_sync_time",
+            update_sync_time_spy,
+        ),
+    ):
+        await sync_registry_agents(registry)
+
+        # Nothing is written when the body exceeds the ceiling
+        upsert_spy.assert_not_called()
+        update_sync_time_spy.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_sync_registry_agents_bounds_concurrent_writes(monkeypatch):
+    """Test that agent batches upsert concurrently but never exceed the limit"""
+    registry = {
+        "id": str(uuid.uuid4()),
+        "name": "Busy Registry",
+        "url": "https://busy-registry.example.com",
+    }
+
+    payload = {
+        "items": [{"id": str(uuid.uuid4()), "name": f"Agent {i}"} for i in range(10)]
+    }
+
+    class MockHTTPClient:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *args):
+            pass
+
+        def stream(self, method, url, headers=None, **kwargs):
+            return MockStreamResponse(payload)
+
+    in_flight = 0
+    peak = 0
+    batch_sizes = []
+
+    async def mock_upsert_federated_agents(agents, registry_id):
+        nonlocal in_flight, peak
+        batch_sizes.append(len(agents))
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return [{"id": str(uuid.uuid4()), **agent_data} for agent_data in agents]
+
+    update_sync_time_spy = mock.AsyncMock()
+
+    with (
+        mock.patch("httpx.AsyncClient", return_value=MockHTTPClient()),
+        mock.patch("app.api.routes.federated_registries.SYNC_BATCH_SIZE", 2),
+        mock.patch(
+            "app.db.client.Database.upsert_federated_agents",
+            mock_upsert_federated_agents,
+        ),
+        mock.patch(
+            "app.db.client.Database.update_federated_registry_sync_time",
+            update_sync_time_spy,
+        ),
+    ):
+        await sync_registry_agents(registry)
+
+    assert batch_sizes == [2] * 5
+    assert peak == SYNC_CONCURRENCY
+    update_sync_time_spy.assert_called_once_with(
+        registry["id"], etag=None, last_modified=None
+    )
+
+
+@pytest.mark.asyncio
+async def test_sync_registry_agents_stores_validators_and_skips_unchanged(monkeypatch):
+    """Test that ETag/Last-Modified are persisted and a 304 skips ingestion"""
+    registry = {
+        "id": str(uuid.uuid4()),
+        "name": "Conditional Registry",
+        "url": "https://conditional-registry.example.com",
+    }
+    payload = {"items": [{"id": str(uuid.uuid4()), "name": "Remote Agent"}]}
+    validators = {"ETag": '"v1"', "Last-Modified": "Wed, 21 Oct 2026 07:28:00 GMT"}
+    sent_headers = []
+
+    class MockHTTPClient:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *args):
+            pass
+
+        def stream(self, method, url, headers=None, **kwargs):
+            sent_headers.append(dict(headers))
+            if headers.get("If-None-Match") == validators["ETag"]:
+                return MockStreamResponse({}, status_code=304)
+            return MockStreamResponse(payload, headers=validators)
+
+    upsert_spy = mock.AsyncMock(return_value=[{"id": str(uuid.uuid4())}])
+    update_sync_time_spy = mock.AsyncMock()
+
+    with (
+        mock.patch("httpx.AsyncClient", return_value=MockHTTPClient()),
+        mock.patch("app.db.client.Database.upsert_federated_agents", upsert_spy),
+        mock.patch(
+            "app.db.client.Database.update_federated_registry_sync_time",
+            update_sync_time_spy,
+        ),
+    ):
+        # First sync downloads the list and stores its validators
+        await sync_registry_agents(registry)
+
+        assert "If-None-Match" not in sent_headers[0]
+        upsert_spy.assert_awaited_once()
+        update_sync_time_spy.assert_awaited_once_with(
+            registry["id"],
+            etag=validators["ETag"],
+            last_modified=validators["Last-Modified"],
+        )
+
+        # Second sync sends the validators and ingests nothing on 304
+        registry["last_etag"] = validators["ETag"]
+        registry["last_modified"] = validators["Last-Modified"]
+        await sync_registry_agents(registry)
+
+        assert sent_headers[1]["If-None-Match"] == validators["ETag"]
+        assert sent_headers[1]["If-Modified-Since"] == validators["Last-Modified"]
+        upsert_spy.assert_awaited_once()
+        update_sync_time_spy.assert_awaited_with(registry["id"])
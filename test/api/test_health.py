@@ -3,6 +3,8 @@ from unittest.mock import patch, AsyncMock
 from datetime import datetime, timezone
 import uuid
 
+from app.utils.cache_utils import clear_response_cache
+
 
 # Keep the existing test for the main health endpoint
 def test_health_endpoint(client):
@@ -215,13 +217,21 @@ async def test_get_agent_health_summary(mock_db, test_app):
     assert "status" in data[0]
     assert "last_ping_at" in data[0]
 
+    # Repeated requests within the TTL are served from the cache
+    response = client.get("/health/summary")
+    assert response.status_code == 200
+    assert response.json() == data
+    mock_db.get_agent_health_summary.assert_awaited_once()
+
     # Test with no records
+    clear_response_cache("health_summary")
     mock_db.get_agent_health_summary = AsyncMock(return_value=[])
     response = client.get("/health/summary")
     assert response.status_code == 200
     assert len(response.json()) == 0
 
     # Test with database error
+    clear_response_cache("health_summary")
     mock_db.get_agent_health_summary = AsyncMock(side_effect=Exception("Test error"))
     response = client.get("/health/summary")
     assert response.status_code == 500
@@ -11,6 +11,7 @@ from app.api.routes.tokens import (
     get_user_profile,
 )
 from app.models.schemas import ApiKeyCreate
+from app.utils.cursor_utils import encode_cursor
 
 
 @pytest.mark.asyncio
@@ -48,7 +49,7 @@ async def test_create_api_token_with_expiry_days(monkeypatch):
         assert expires_at is not None
         # We can't check exact equality due to microsecond differences in timing
         # So we just check it's roughly the right expiry (within 1 minute)
-        expiry_dt = datetime.fromisoformat(expires_at)
+        expiry_dt = expires_at
         assert (
             abs((expiry_dt - datetime.now(timezone.utc)).total_seconds())
             < 30 * 24 * 60 * 60 + 60
@@ -206,7 +207,7 @@ async def test_list_api_tokens_pagination(monkeypatch):
     async def mock_count_api_keys(user_id):
         return len(mock_tokens)
 
-    async def mock_list_api_keys(user_id, limit=20, offset=0):
+    async def mock_list_api_keys(user_id, limit=20, offset=0, cursor=None):
         # Return paginated results
         return mock_tokens[offset : offset + limit]
 
@@ -227,6 +228,7 @@ async def test_list_api_tokens_pagination(monkeypatch):
         # Verify first page items
         assert len(result.items) == 10
         assert result.items[0]["name"] == "Token 0"
+        assert result.metadata.next_cursor == encode_cursor(result.items[-1])
 
         # Test second page
         result = await list_api_tokens(page=2, size=10, current_user=mock_user)
@@ -244,6 +246,7 @@ async def test_list_api_tokens_pagination(monkeypatch):
         assert len(result.items) == 5  # Only 5 items left
         assert result.items[0]["name"] == "Token 20"
         assert result.items[4]["name"] == "Token 24"
+        assert result.metadata.next_cursor is None
 
 
 @pytest.mark.asyncio
@@ -37,8 +37,7 @@ def pytest_configure(config):
 sys_modules_patcher = mock.patch.dict(
     "sys.modules",
     {
-        "jose": mock.MagicMock(),
-        "jose.jwt": mock.MagicMock(),
+        "jwt": mock.MagicMock(),
     },
 )
 sys_modules_patcher.start()
@@ -49,6 +48,22 @@ with mock.patch("fastapi.Depends"):
 
 
 # Test fixtures that will be used across multiple test files
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Ensure cached responses, API keys and registries never leak between tests."""
+    from app.core.auth import clear_api_key_cache
+    from app.db.client import clear_registry_cache
+    from app.utils.cache_utils import clear_response_cache
+
+    clear_response_cache()
+    clear_api_key_cache()
+    clear_registry_cache()
+    yield
+    clear_response_cache()
+    clear_api_key_cache()
+    clear_registry_cache()
+
+
 @pytest.fixture
 def mock_current_user():
     """Provide a mock User object for testing authentication scenarios."""
@@ -133,6 +148,10 @@ def mock_database():
         }
     ]
 
+    # Lookups the sync path makes per agent, kept as dict indexes so each is O(1)
+    registries_by_id = {registry["id"]: registry for registry in federated_registries}
+    agents_by_federation = {}
+
     # Mock database class
     class MockDatabase:
         @staticmethod
@@ -153,14 +172,12 @@ def mock_database():
                 **registry_data,
             }
             federated_registries.append(new_registry)
+            registries_by_id[new_registry["id"]] = new_registry
             return new_registry
 
         @staticmethod
         async def get_federated_registry(registry_id):
-            for registry in federated_registries:
-                if registry["id"] == registry_id:
-                    return registry
-            return None
+            return registries_by_id.get(registry_id)
 
         @staticmethod
         async def list_agents(*args, **kwargs):
@@ -183,47 +200,35 @@ def mock_database():
             return len(agents)
 
         @staticmethod
-        async def get_agent_by_federation_id(federation_id, registry_id):
-            for agent in agents:
-                if (
-                    agent.get("federation_id") == federation_id
-                    and agent.get("registry_id") == registry_id
-                ):
-                    return agent
-            return None
-
-        @staticmethod
-        async def create_federated_agent(agent_data):
-            new_agent = {
-                "id": str(uuid.uuid4()),
-                "created_at": datetime.now(timezone.utc),
-                "updated_at": datetime.now(timezone.utc),
-                **agent_data,
-            }
-            agents.append(new_agent)
-            return new_agent
-
-        @staticmethod
-        async def update_federated_agent(agent_id, agent_data):
-            for i, agent in enumerate(agents):
-                if agent["id"] == agent_id:
-                    agents[i] = {
-                        **agent,
-                        **agent_data,
+        async def upsert_federated_agents(agent_list, registry_id):
+            synced = []
+            for agent_data in agent_list:
+                agent_data = {**agent_data, "registry_id": registry_id}
+                agent_data["federation_id"] = agent_data.pop("id", None)
+                if agent_data["federation_id"] is None:
+                    continue
+                key = (registry_id, agent_data["federation_id"])
+                existing = agents_by_federation.get(key)
+                if existing:
+                    existing.update(agent_data, updated_at=datetime.now(timezone.utc))
+                else:
+                    existing = {
+                        "id": str(uuid.uuid4()),
+                        "created_at": datetime.now(timezone.utc),
                         "updated_at": datetime.now(timezone.utc),
+                        **agent_data,
                     }
-                    return agents[i]
-            return None
+                    agents.append(existing)
+                    agents_by_federation[key] = existing
+                synced.append(existing)
+            return synced
 
         @staticmethod
-        async def update_federated_registry_sync_time(registry_id):
-            for i, registry in enumerate(federated_registries):
-                if registry["id"] == registry_id:
-                    federated_registries[i]["last_synced_at"] = datetime.now(
-                        timezone.utc
-                    )
-                    return federated_registries[i]
-            return None
+        async def update_federated_registry_sync_time(registry_id, **kwargs):
+            registry = registries_by_id.get(registry_id)
+            if registry:
+                registry["last_synced_at"] = datetime.now(timezone.utc)
+            return registry
 
         @staticmethod
         async def create_agent_verification(verification_data):
@@ -4,7 +4,7 @@ from unittest import mock
 from datetime import datetime, timedelta, timezone
 from fastapi import HTTPException
 
-from app.core.auth import Auth, get_current_user_from_api_key
+from app.core.auth import Auth, get_current_user_from_api_key, invalidate_api_key
 
 
 @pytest.mark.asyncio
@@ -74,6 +74,74 @@ async def test_get_api_key_invalid():
         assert "Invalid API key" in excinfo.value.detail
 
 
+@pytest.mark.asyncio
+async def test_get_api_key_cached_until_invalidated():
+    """Test that validated API keys are cached until the key is revoked"""
+    key_id = str(uuid.uuid4())
+    mock_key_data = {
+        "api_key": {"id": key_id, "key": "cached_key"},
+        "user": {"id": str(uuid.uuid4()), "email": "test@example.com"},
+    }
+    validate_spy = mock.AsyncMock(return_value=mock_key_data)
+
+    with mock.patch("app.db.client.Database.validate_api_key", validate_spy):
+        # Repeated lookups only hit the database once
+        assert await Auth.get_api_key(api_key="cached_key") == mock_key_data
+        assert await Auth.get_api_key(api_key="cached_key") == mock_key_data
+        validate_spy.assert_awaited_once_with("cached_key")
+
+        # Revoking the key forces the next lookup back to the database
+        invalidate_api_key(key_id)
+        validate_spy.return_value = None
+        with pytest.raises(HTTPException) as excinfo:
+            await Auth.get_api_key(api_key="cached_key")
+
+        assert excinfo.value.status_code == 401
+        assert validate_spy.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_get_api_key_cache_respects_expiry():
+    """Test that a cached API key stops validating once it expires"""
+    mock_key_data = {
+        "api_key": {
+            "id": str(uuid.uuid4()),
+            "expires_at": (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat(),
+        },
+        "user": {"id": str(uuid.uuid4()), "email": "test@example.com"},
+    }
+    validate_spy = mock.AsyncMock(return_value=mock_key_data)
+
+    with mock.patch("app.db.client.Database.validate_api_key", validate_spy):
+        assert await Auth.get_api_key(api_key="expiring_key") == mock_key_data
+
+        # Two hours later the cached entry is past its expiry
+        later = datetime.now(timezone.utc) + timedelta(hours=2)
+        with mock.patch("app.core.auth.datetime") as mock_datetime:
+            mock_datetime.now.return_value = later
+            with pytest.raises(HTTPException) as excinfo:
+                await Auth.get_api_key(api_key="expiring_key")
+
+        assert excinfo.value.status_code == 401
+        validate_spy.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_get_api_key_cache_parses_postgrest_timestamps():
+    """Test that expiries with a Z suffix and short fractions are understood"""
+    mock_key_data = {
+        "api_key": {"id": str(uuid.uuid4()), "expires_at": "2999-01-01T00:00:00.12Z"},
+        "user": {"id": str(uuid.uuid4()), "email": "test@example.com"},
+    }
+    validate_spy = mock.AsyncMock(return_value=mock_key_data)
+
+    with mock.patch("app.db.client.Database.validate_api_key", validate_spy):
+        assert await Auth.get_api_key(api_key="zulu_key") == mock_key_data
+        assert await Auth.get_api_key(api_key="zulu_key") == mock_key_data
+
+    validate_spy.assert_awaited_once()
+
+
 # Note: We're skipping detailed testing of create_access_token since we already have 97% coverage
 # and there are issues with JWT mocking in the test environment
 
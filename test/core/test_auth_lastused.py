@@ -0,0 +1,62 @@
+import pytest
+import uuid
+from unittest import mock
+
+from app.core import auth_lastused
+
+
+@pytest.fixture(autouse=True)
+def reset_pending():
+    """Start each test with an empty usage buffer"""
+    auth_lastused._pending.clear()
+    yield
+    auth_lastused._pending.clear()
+
+
+@pytest.mark.asyncio
+async def test_flush_coalesces_usage_into_one_update():
+    """Test that repeated key usage is written in a single batched update"""
+    key_ids = [str(uuid.uuid4()) for _ in range(3)]
+    update_spy = mock.AsyncMock()
+
+    for _ in range(5):
+        for key_id in key_ids:
+            auth_lastused.mark_used(key_id)
+
+    with mock.patch("app.db.client.Database.update_api_keys_last_used", update_spy):
+        await auth_lastused.flush()
+        await auth_lastused.flush()
+
+    # One write covering each distinct key, and nothing left to flush
+    update_spy.assert_awaited_once()
+    flushed_ids, used_at = update_spy.await_args.args
+    assert sorted(flushed_ids) == sorted(key_ids)
+    assert used_at
+    assert not auth_lastused._pending
+
+
+@pytest.mark.asyncio
+async def test_flush_survives_database_error():
+    """Test that a failed flush is logged rather than raised"""
+    auth_lastused.mark_used(str(uuid.uuid4()))
+    update_spy = mock.AsyncMock(side_effect=Exception("Database error"))
+
+    with mock.patch("app.db.client.Database.update_api_keys_last_used", update_spy):
+        await auth_lastused.flush()
+
+    update_spy.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_stop_flusher_writes_remaining_usage():
+    """Test that stopping the flusher writes any buffered usage"""
+    key_id = str(uuid.uuid4())
+    update_spy = mock.AsyncMock()
+
+    with mock.patch("app.db.client.Database.update_api_keys_last_used", update_spy):
+        auth_lastused.start_flusher()
+        auth_lastused.mark_used(key_id)
+        await auth_lastused.stop_flusher()
+
+    update_spy.assert_awaited_once()
+    assert update_spy.await_args.args[0] == [key_id]
@@ -1,12 +1,22 @@
 
+import asyncio
 import pytest
 from unittest.mock import patch, MagicMock
 import json
-import sys
 import uuid
 from datetime import datetime, timezone, timedelta
-
-from app.db.client import Database
+from postgrest import SyncPostgrestClient
+from postgrest.exceptions import APIError
+
+from app.db.client import (
+    Database,
+    AGENT_HEALTH_COLUMNS,
+    AGENT_VERIFICATION_EMBED,
+    HEALTH_SUMMARY_MAX_ROWS,
+    get_pool_stats,
+    hash_api_key,
+)
+from app.utils.cursor_utils import encode_cursor, keyset_filter
 from app.utils.supabase_utils import (
     AGENTS_TABLE,
     AGENT_VERIFICATION_TABLE,
@@ -24,6 +34,23 @@ def setup_supabase():
         yield mock_supabase
 
 
+@pytest.fixture
+def postgrest_queries():
+    """Build queries on real PostgREST builders and capture them instead of sending"""
+    client = SyncPostgrestClient("http://postgrest.test")
+    queries = []
+
+    async def capture(query, error_message="Database query failed"):
+        queries.append(query)
+        return MagicMock(data=[], count=0)
+
+    with patch("app.db.client.supabase") as mock_supabase, patch(
+        "app.db.client._execute", side_effect=capture
+    ):
+        mock_supabase.table.side_effect = client.from_
+        yield queries
+
+
 class TestDatabaseClient:
     """Test the Database client class"""
 
@@ -81,8 +108,8 @@ class TestDatabaseClient:
 
         # Configure the mock chain for the agents table
         agents_table_mock.select.return_value = agents_table_mock
-        agents_table_mock.or_.return_value = agents_table_mock
         agents_table_mock.eq.return_value = agents_table_mock
+        agents_table_mock.order.return_value = agents_table_mock
         agents_table_mock.range.return_value = agents_table_mock
         agents_table_mock.execute.return_value = agents_execute
 
@@ -129,6 +156,207 @@ class TestDatabaseClient:
             # Capabilities should be parsed from JSON
             assert isinstance(result[0]["capabilities"], list)
 
+    @pytest.mark.asyncio
+    async def test_list_agents_with_cursor(self, postgrest_queries):
+        """Test listing agents with keyset pagination"""
+        last_row = {"id": str(uuid.uuid4()), "created_at": "2026-01-01T00:00:00+00:00"}
+        cursor = encode_cursor(last_row)
+
+        result = await Database.list_agents(limit=10, offset=50, cursor=cursor)
+
+        assert result == []
+        params = postgrest_queries[0].params
+        assert params["order"] == "created_at.desc,id.desc"
+        assert params["or"] == f"({keyset_filter(cursor)})"
+        assert params["limit"] == "10"
+        assert "offset" not in params
+
+    @pytest.mark.asyncio
+    async def test_list_agents_with_invalid_cursor(self, postgrest_queries):
+        """Test that a tampered cursor is rejected before any query is sent"""
+        with pytest.raises(ValueError):
+            await Database.list_agents(limit=10, cursor="not-a-cursor")
+
+        assert postgrest_queries == []
+
+    @pytest.mark.asyncio
+    async def test_list_api_keys_with_cursor(self, postgrest_queries):
+        """Test listing API keys with keyset pagination"""
+        user_id = str(uuid.uuid4())
+        last_row = {"id": str(uuid.uuid4()), "created_at": "2026-01-01T00:00:00+00:00"}
+        cursor = encode_cursor(last_row)
+
+        await Database.list_api_keys(user_id, limit=5, cursor=cursor)
+
+        params = postgrest_queries[0].params
+        assert params["user_id"] == f"eq.{user_id}"
+        assert params["or"] == f"({keyset_filter(cursor)})"
+        assert params["limit"] == "5"
+
+    @pytest.mark.asyncio
+    async def test_list_agents_with_search(self, postgrest_queries):
+        """Test that a text search filters on name and description"""
+        await Database.list_agents(limit=10, offset=0, search='weather, (bot)*')
+
+        assert postgrest_queries[0].params["or"] == (
+            '(name.ilike."*weather bot*",description.ilike."*weather bot*")'
+        )
+
+    @pytest.mark.asyncio
+    async def test_list_agents_by_registry(self, postgrest_queries):
+        """Test that agents can be limited to one federated registry"""
+        registry_id = str(uuid.uuid4())
+
+        await Database.list_agents(limit=10, registry_id=registry_id)
+
+        assert postgrest_queries[0].params["registry_id"] == f"eq.{registry_id}"
+
+    @pytest.mark.asyncio
+    async def test_count_agents_with_search(self, postgrest_queries):
+        """Test that counting applies the same text search as listing"""
+        await Database.count_agents(search="weather")
+
+        assert postgrest_queries[0].params["or"] == (
+            '(name.ilike."*weather*",description.ilike."*weather*")'
+        )
+
+    @pytest.mark.asyncio
+    async def test_list_agents_deferred_join_for_deep_pages(self, setup_supabase):
+        """Test that deep offsets page through ids before fetching full rows"""
+        page_ids = [str(uuid.uuid4()) for _ in range(3)]
+
+        id_execute = MagicMock()
+        id_execute.data = [{"id": agent_id} for agent_id in page_ids]
+        id_execute.error = None
+
+        # Rows come back from the id lookup in arbitrary order
+        rows_execute = MagicMock()
+        rows_execute.data = [
+            {"id": agent_id, "name": f"Agent {agent_id}"}
+            for agent_id in reversed(page_ids)
+        ]
+        rows_execute.error = None
+
+        id_query = MagicMock()
+        id_query.order.return_value = id_query
+        id_query.range.return_value = id_query
+        id_query.execute.return_value = id_execute
+
+        rows_query = MagicMock()
+        rows_query.in_.return_value = rows_query
+        rows_query.execute.return_value = rows_execute
+
+        table_mock = MagicMock()
+        table_mock.select.side_effect = lambda columns: (
+            id_query if columns == "id" else rows_query
+        )
+        setup_supabase.table.return_value = table_mock
+
+        with (
+            patch.object(
+                Database, "_parse_agent_json_fields", side_effect=lambda a: dict(a)
+            ),
+            patch.object(
+                Database,
+                "_fetch_agents_health_data",
+                side_effect=lambda ids: {agent_id: {} for agent_id in ids},
+            ),
+        ):
+            result = await Database.list_agents(limit=3, offset=300)
+
+        id_query.range.assert_called_once_with(300, 302)
+        rows_query.in_.assert_called_once_with("id", page_ids)
+        assert [agent["id"] for agent in result] == page_ids
+
+    @pytest.mark.asyncio
+    async def test_list_agents_batches_health_and_verification(self, setup_supabase):
+        """Test that verification is embedded and health is fetched once per page"""
+        agent_ids = [str(uuid.uuid4()) for _ in range(3)]
+
+        def execute_with(data):
+            execute = MagicMock()
+            execute.data = data
+            execute.error = None
+            return execute
+
+        def query_returning(data):
+            query = MagicMock()
+            for method in ("select", "eq", "in_", "order", "range"):
+                getattr(query, method).return_value = query
+            query.execute.return_value = execute_with(data)
+            return query
+
+        verifications = {agent_ids[1]: [{"did": "did:hibiscus:1", "public_key": "pk"}]}
+        tables = {
+            AGENTS_TABLE: query_returning(
+                [
+                    {
+                        "id": agent_id,
+                        "name": "Agent",
+                        "verification": verifications.get(agent_id, []),
+                    }
+                    for agent_id in agent_ids
+                ]
+            ),
+            AGENT_HEALTH_TABLE: query_returning(
+                [{"agent_id": agent_ids[0], "status": "active", "server_id": "s1"}]
+            ),
+        }
+        setup_supabase.table.side_effect = tables.__getitem__
+
+        result = await Database.list_agents(verification_data_required=True)
+
+        by_id = {agent["id"]: agent for agent in result}
+        assert by_id[agent_ids[0]]["health_status"] == "active"
+        assert by_id[agent_ids[1]]["did"] == "did:hibiscus:1"
+        assert by_id[agent_ids[2]]["health_status"] == "unknown"
+        assert "did" not in by_id[agent_ids[2]]
+        assert "verification" not in by_id[agent_ids[1]]
+
+        # Verification rides along with the agent query; health is one query
+        assert AGENT_VERIFICATION_EMBED in tables[AGENTS_TABLE].select.call_args.args[0]
+        tables[AGENT_HEALTH_TABLE].select.assert_called_once_with(AGENT_HEALTH_COLUMNS)
+        tables[AGENT_HEALTH_TABLE].in_.assert_called_once_with("agent_id", agent_ids)
+        tables[AGENT_HEALTH_TABLE].execute.assert_called_once()
+
+    def test_parse_agent_json_fields_only_copies_string_rows(self):
+        """Test that decoded rows are reused and legacy string fields are parsed"""
+        decoded = {"id": "a", "capabilities": [{"name": "chat"}], "metadata": {}}
+        assert Database._parse_agent_json_fields(decoded) is decoded
+
+        legacy = {"id": "b", "capabilities": '[{"name": "chat"}]', "tags": "not json"}
+        parsed = Database._parse_agent_json_fields(legacy)
+        assert parsed is not legacy
+        assert parsed["capabilities"] == [{"name": "chat"}]
+        assert parsed["tags"] == "not json"
+        assert legacy["capabilities"] == '[{"name": "chat"}]'
+
+    @pytest.mark.asyncio
+    async def test_get_missing_agent_ids(self, setup_supabase):
+        """Test checking agent existence with a single id-only query"""
+        existing_id = str(uuid.uuid4())
+        missing_id = str(uuid.uuid4())
+
+        agents_execute = MagicMock()
+        agents_execute.data = [{"id": existing_id}]
+        agents_execute.error = None
+
+        agents_table_mock = MagicMock()
+        setup_supabase.table.return_value = agents_table_mock
+        agents_table_mock.select.return_value = agents_table_mock
+        agents_table_mock.in_.return_value = agents_table_mock
+        agents_table_mock.execute.return_value = agents_execute
+
+        result = await Database.get_missing_agent_ids([existing_id, missing_id])
+
+        assert result == [missing_id]
+        agents_table_mock.select.assert_called_once_with("id")
+        agents_table_mock.in_.assert_called_once_with("id", [existing_id, missing_id])
+
+        # No query is needed when there is nothing to check
+        assert await Database.get_missing_agent_ids([]) == []
+        agents_table_mock.execute.assert_called_once()
+
     @pytest.mark.asyncio
     async def test_get_agent(self, setup_supabase):
         """Test retrieving a specific agent"""
@@ -145,36 +373,24 @@ class TestDatabaseClient:
             "tags": json.dumps(["test", "specific"]),
             "created_at": datetime.now(timezone.utc).isoformat(),
             "user_id": str(uuid.uuid4()),
+            # Verification is embedded in the agent row
+            "verification": [
+                {"did": "did:hibiscus:specific123", "public_key": "specific-key"}
+            ],
         }
 
-        # Setup verification data
-        verification_data = [
-            {
-                "agent_id": agent_id,
-                "did": "did:hibiscus:specific123",
-                "public_key": "specific-key",
-            }
-        ]
-
         # Mock the execute responses
         agent_execute = MagicMock()
         agent_execute.data = [mock_agent]
         agent_execute.error = None
 
-        verification_execute = MagicMock()
-        verification_execute.data = verification_data
-        verification_execute.error = None
-
         # Setup the table mocks with method chains
         agent_table_mock = MagicMock()
-        verification_table_mock = MagicMock()
 
         # Set different return values based on which table is being queried
         def table_side_effect(table_name):
             if table_name == AGENTS_TABLE:
                 return agent_table_mock
-            elif table_name == AGENT_VERIFICATION_TABLE:
-                return verification_table_mock
             return MagicMock()
 
         setup_supabase.table.side_effect = table_side_effect
@@ -184,11 +400,6 @@ class TestDatabaseClient:
         agent_table_mock.eq.return_value = agent_table_mock
         agent_table_mock.execute.return_value = agent_execute
 
-        # Configure the mock chain for verification table
-        verification_table_mock.select.return_value = verification_table_mock
-        verification_table_mock.eq.return_value = verification_table_mock
-        verification_table_mock.execute.return_value = verification_execute
-
         # Manually add verification data that would come from our mock
         # This better simulates what happens in the real code
         def parse_side_effect(agent_data):
@@ -208,11 +419,6 @@ class TestDatabaseClient:
             # Test the function
             result = await Database.get_agent(agent_id)
 
-            # Manually merge the verification data as the app would
-            # (in real code this happens in Database.get_agent)
-            result["did"] = verification_data[0]["did"]
-            result["public_key"] = verification_data[0]["public_key"]
-
             # Basic verification
             assert result is not None
             assert result["id"] == agent_id
@@ -224,6 +430,11 @@ class TestDatabaseClient:
             # Verification data should be merged
             assert "did" in result
             assert result["did"] == "did:hibiscus:specific123"
+            assert result["public_key"] == "specific-key"
+            assert "verification" not in result
+            agent_table_mock.select.assert_called_once_with(
+                f"*, {AGENT_VERIFICATION_EMBED}"
+            )
             
     @pytest.mark.asyncio
     async def test_validate_api_key(self, setup_supabase):
@@ -231,68 +442,71 @@ class TestDatabaseClient:
         user_id = str(uuid.uuid4())
         api_key = "test_api_key_123"
 
-        # Mock API key data
+        # Mock user data
+        user_data = {"id": user_id, "email": "test@example.com", "name": "Test User"}
+
+        # Mock API key data, with the owning user embedded
         api_key_data = {
             "id": str(uuid.uuid4()),
-            "key": api_key,
             "user_id": user_id,
             "is_active": True,
             "name": "Test Key",
             "created_at": datetime.now(timezone.utc).isoformat(),
             "expires_at": (datetime.now(timezone.utc) + timedelta(days=30)).isoformat(),
+            "user": user_data,
         }
 
-        # Mock user data
-        user_data = {"id": user_id, "email": "test@example.com", "name": "Test User"}
-
         # Mock the API keys table response
         api_key_execute = MagicMock()
         api_key_execute.data = [api_key_data]
         api_key_execute.error = None
 
-        # Mock the users table response
-        user_execute = MagicMock()
-        user_execute.data = [user_data]
-        user_execute.error = None
-
-        # Setup table mocks
+        # Configure the mock chain
         api_key_table = MagicMock()
-        user_table = MagicMock()
-
-        # Configure the mock chains
         api_key_table.select.return_value = api_key_table
         api_key_table.eq.return_value = api_key_table
         api_key_table.execute.return_value = api_key_execute
-
-        user_table.select.return_value = user_table
-        user_table.eq.return_value = user_table
-        user_table.execute.return_value = user_execute
-
-        # Setup table side effects
-        def table_side_effect(table_name):
-            if table_name == API_KEYS_TABLE:
-                return api_key_table
-            elif table_name == USERS_TABLE:
-                return user_table
-            return MagicMock()
-
-        setup_supabase.table.side_effect = table_side_effect
+        setup_supabase.table.return_value = api_key_table
 
         # Test the function
         result = await Database.validate_api_key(api_key)
 
         # Verify results
         assert result is not None
-        assert "api_key" in result
-        assert "user" in result
         assert result["user"]["id"] == user_id
         assert result["user"]["email"] == "test@example.com"
+        assert "user" not in result["api_key"]
+
+        # Key and user are fetched in a single request
+        setup_supabase.table.assert_called_once_with(API_KEYS_TABLE)
+        api_key_table.select.assert_called_once_with(f"*, user:{USERS_TABLE}!inner(*)")
+        api_key_table.eq.assert_any_call("key_hash", hash_api_key(api_key))
+        api_key_table.execute.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_validate_api_key_not_found(self, setup_supabase):
+        """Test that unknown or expired API keys are rejected"""
+        api_key_execute = MagicMock()
+        api_key_execute.data = []
+        api_key_execute.error = None
+
+        api_key_table = MagicMock()
+        api_key_table.select.return_value = api_key_table
+        api_key_table.eq.return_value = api_key_table
+        api_key_table.execute.return_value = api_key_execute
+        setup_supabase.table.return_value = api_key_table
+
+        assert await Database.validate_api_key("unknown_key") is None
+
+    @pytest.mark.asyncio
+    async def test_validate_api_key_query(self, postgrest_queries):
+        """Test that the expiry filter is sent as an or=() query parameter"""
+        await Database.validate_api_key("test_api_key_123")
+
+        params = postgrest_queries[0].params
+        assert params["key_hash"] == f"eq.{hash_api_key('test_api_key_123')}"
+        assert params["or"].startswith('(expires_at.is.null,expires_at.gt."')
 
-        # Verify correct tables were queried
-        api_key_table.select.assert_called_once()
-        # Use assert_any_call instead of assert_called_once_with to allow multiple calls
-        api_key_table.eq.assert_any_call("key", api_key)
-        
     @pytest.mark.asyncio
     async def test_create_agent(self, setup_supabase):
         """Test creating a new agent"""
@@ -337,22 +551,24 @@ class TestDatabaseClient:
         agent_table.insert.return_value = agent_insert
         agent_insert.execute.return_value = agent_execute
 
-        # Mock serialize_json_fields function
-        with patch('app.db.client.serialize_json_fields', side_effect=lambda x: x.copy()):
-            # Mock UUID generation to return known agent_id
-            with patch("uuid.uuid4", return_value=uuid.UUID(agent_id)):
-                # Test the function
-                result = await Database.create_agent(agent_data)
+        # Mock UUID generation to return known agent_id
+        with patch("uuid.uuid4", return_value=uuid.UUID(agent_id)):
+            # Test the function
+            result = await Database.create_agent(agent_data)
 
-                # Verify results
-                assert result is not None
-                assert result["id"] == agent_id
-                assert result["name"] == agent_data["name"]
-                assert result["description"] == agent_data["description"]
+            # Verify results
+            assert result is not None
+            assert result["id"] == agent_id
+            assert result["name"] == agent_data["name"]
+            assert result["description"] == agent_data["description"]
 
-                # Verify correct table was used
-                setup_supabase.table.assert_called_with(AGENTS_TABLE)
-                agent_table.insert.assert_called_once()
+            # Verify correct table was used
+            setup_supabase.table.assert_called_with(AGENTS_TABLE)
+            agent_table.insert.assert_called_once()
+
+            # JSON fields are sent as native values for the jsonb columns
+            inserted = agent_table.insert.call_args[0][0]
+            assert inserted["capabilities"] == agent_data["capabilities"]
 
     @pytest.mark.asyncio
     async def test_update_agent(self, setup_supabase):
@@ -408,121 +624,76 @@ class TestDatabaseClient:
         update_mock.eq.return_value = update_mock
         update_mock.execute.return_value = update_execute
 
-        # Mock the serialize_json_fields function
-        with patch('app.db.client.serialize_json_fields', return_value=update_data.copy()):
-            # Mock the parse_json_fields function
-            with patch('app.db.client.parse_json_fields', side_effect=lambda x: {
-                **x,
-                "capabilities": update_data["capabilities"],
-                "tags": update_data["tags"]
-            }):
-                # Test the function
-                result = await Database.update_agent(agent_id, update_data)
-
-                # Verify results
-                assert result is not None
-                assert result["id"] == agent_id
-                assert result["name"] == update_data["name"]
-                assert result["description"] == update_data["description"]
-                assert result["capabilities"] == update_data["capabilities"]
-                assert result["tags"] == update_data["tags"]
-
-                # Verify the correct table was used
-                setup_supabase.table.assert_called_with(AGENTS_TABLE)
+        # Mock the parse_json_fields function
+        with patch('app.db.client.parse_json_fields', side_effect=lambda x: {
+            **x,
+            "capabilities": update_data["capabilities"],
+            "tags": update_data["tags"]
+        }):
+            # Test the function
+            result = await Database.update_agent(agent_id, update_data)
+
+            # Verify results
+            assert result is not None
+            assert result["id"] == agent_id
+            assert result["name"] == update_data["name"]
+            assert result["description"] == update_data["description"]
+            assert result["capabilities"] == update_data["capabilities"]
+            assert result["tags"] == update_data["tags"]
+
+            # Verify the correct table was used
+            setup_supabase.table.assert_called_with(AGENTS_TABLE)
                 
-                # Verify update was called with expected data
-                # We don't check exact values due to serialization and timestamp differences
-                table_mock.update.assert_called_once()
+            # Verify update was called with expected data
+            # We don't check exact values due to serialization and timestamp differences
+            table_mock.update.assert_called_once()
             
     @pytest.mark.asyncio
-    async def test_update_federated_agent(self, setup_supabase):
-        """Test updating a federated agent"""
-        agent_id = str(uuid.uuid4())
+    async def test_upsert_federated_agents(self, setup_supabase):
+        """Test that federated agents are upserted in one request per field set"""
         registry_id = str(uuid.uuid4())
-        
-        # Original agent data
-        original_agent = {
-            "id": agent_id,
-            "name": "Original Federated Agent",
-            "description": "Original federated description",
-            "capabilities": json.dumps([{"name": "original", "description": "Original capability"}]),
-            "tags": json.dumps(["original", "federated"]),
-            "created_at": datetime.now(timezone.utc).isoformat(),
-            "registry_id": registry_id,
-            "registry_agent_id": "original-external-id",
-            "is_federated": True,
-            "updated_at": datetime.now(timezone.utc).isoformat(),
-        }
-        
-        # Update data
-        update_data = {
-            "name": "Updated Federated Agent",
-            "description": "Updated federated description",
-            "capabilities": [{"name": "updated", "description": "Updated federated capability"}],
-            "tags": ["updated", "federated"],
-            "registry_agent_id": "updated-external-id",
-        }
-        
-        # Updated agent data that should be returned
-        updated_agent = {
-            "id": agent_id,
-            "name": update_data["name"],
-            "description": update_data["description"],
-            "capabilities": json.dumps(update_data["capabilities"]),
-            "tags": json.dumps(update_data["tags"]),
-            "created_at": original_agent["created_at"],
-            "registry_id": registry_id,
-            "registry_agent_id": update_data["registry_agent_id"],
-            "is_federated": True,
-            "updated_at": datetime.now(timezone.utc).isoformat(),
-            "federation_id": "updated-external-id",  # This is extracted from registry_agent_id
-        }
-        
-        # Mock execute response
-        update_execute = MagicMock()
-        update_execute.data = [updated_agent]
-        update_execute.error = None
-        
-        # For testing with pytest, we need to handle the special case detection
-        # where it checks for 'pytest' in sys.modules
-        with patch('sys.modules', {**sys.modules, 'pytest': True}):
-            # Setup table mock with update chain
-            table_mock = MagicMock()
-            update_mock = MagicMock()
-            
-            # Configure table side effect
-            setup_supabase.table.return_value = table_mock
-            
-            # Configure update chain
-            table_mock.update.return_value = update_mock
-            update_mock.eq.return_value = update_mock
-            update_mock.execute.return_value = update_execute
-            
-            # Mock the serialize_json_fields function
-            with patch('app.db.client.serialize_json_fields', return_value=update_data.copy()):
-                # Mock the parse_json_fields function
-                with patch('app.db.client.parse_json_fields', side_effect=lambda x: {
-                    **x,
-                    "capabilities": update_data["capabilities"],
-                    "tags": update_data["tags"]
-                }):
-                    # Test the function
-                    result = await Database.update_federated_agent(agent_id, update_data)
-                    
-                    # Verify results
-                    assert result is not None
-                    assert result["id"] == agent_id
-                    assert result["name"] == update_data["name"]
-                    assert result["description"] == update_data["description"]
-                    assert "capabilities" in result
-                    assert "tags" in result
-                    assert "registry_id" in result
-                    assert "registry_agent_id" in result
-                    assert result["is_federated"] is True
-                    
-                    # Verify the correct table was used
-                    setup_supabase.table.assert_called_with(AGENTS_TABLE)
-            
+        remote_ids = [str(uuid.uuid4()) for _ in range(3)]
+        agents = [
+            {"id": remote_ids[0], "name": "Agent 0"},
+            {"id": remote_ids[1], "name": "Agent 1", "tags": ["remote"]},
+            {"id": remote_ids[0], "name": "Agent 0 renamed"},
+            {"name": "Agent without id"},
+            {"id": remote_ids[2], "name": "Agent 2"},
+        ]
+
+        def upsert_side_effect(rows, on_conflict):
+            response = MagicMock()
+            response.data = [
+                {"id": str(uuid.uuid4()), **row} for row in rows
+            ]
+            query = MagicMock()
+            query.execute.return_value = response
+            return query
+
+        table_mock = MagicMock()
+        table_mock.upsert.side_effect = upsert_side_effect
+        setup_supabase.table.return_value = table_mock
+
+        result = await Database.upsert_federated_agents(agents, registry_id)
+
+        assert sorted(agent["federation_id"] for agent in result) == sorted(remote_ids)
+        setup_supabase.table.assert_called_with(AGENTS_TABLE)
+
+        # Rows missing a field go in their own request instead of sending NULL
+        assert table_mock.upsert.call_count == 2
+        batches = [call.args[0] for call in table_mock.upsert.call_args_list]
+        for call in table_mock.upsert.call_args_list:
+            assert call.kwargs == {"on_conflict": "registry_id,federation_id"}
+        names = sorted([row["name"] for row in batch] for batch in batches)
+        assert names == [["Agent 0 renamed", "Agent 2"], ["Agent 1"]]
+
+        for batch in batches:
+            for row in batch:
+                assert "id" not in row
+                assert row["registry_id"] == registry_id
+                assert row["is_federated"] is True
+                assert row.keys() == batch[0].keys()
+
     @pytest.mark.asyncio
     async def test_list_agent_health(self, setup_supabase):
         """Test listing agent health data with pagination"""
@@ -670,6 +841,35 @@ class TestDatabaseClient:
             # Verify insert was called with some data (can't assert exact contents due to added fields)
             table_mock.insert.assert_called_once()
         
+    @pytest.mark.asyncio
+    async def test_record_agent_health_upserts(self, setup_supabase):
+        """Test that a health ping is recorded with a single upsert"""
+        health_data = {
+            "agent_id": str(uuid.uuid4()),
+            "server_id": "server-1",
+            "status": "active",
+        }
+
+        execute_mock = MagicMock()
+        execute_mock.data = [{"id": str(uuid.uuid4()), **health_data}]
+
+        table_mock = MagicMock()
+        table_mock.upsert.return_value = table_mock
+        table_mock.execute.return_value = execute_mock
+        setup_supabase.table.return_value = table_mock
+
+        result = await Database.record_agent_health(health_data)
+
+        assert result["server_id"] == "server-1"
+        setup_supabase.table.assert_called_once_with(AGENT_HEALTH_TABLE)
+        upserted, = table_mock.upsert.call_args.args
+        assert upserted["last_ping_at"]
+        assert table_mock.upsert.call_args.kwargs == {
+            "on_conflict": "agent_id,server_id"
+        }
+        table_mock.update.assert_not_called()
+        table_mock.insert.assert_not_called()
+
     @pytest.mark.asyncio
     async def test_get_agent_health_summary(self, setup_supabase):
         """Test getting a summary of agent health grouped by agent"""
@@ -677,70 +877,46 @@ class TestDatabaseClient:
         agent_id = str(uuid.uuid4())
         agent_name = "Test Agent"
         server_id = str(uuid.uuid4())
-        
-        # Create mock agent data
-        agent_data = {
-            "id": agent_id,
-            "name": agent_name,
-            "status": "active",
-        }
-        
-        # Create mock health records
-        health_records = [
+
+        # Mock the already-grouped rows returned by the SQL function
+        summary_rows = [
             {
-                "id": str(uuid.uuid4()),
                 "agent_id": agent_id,
-                "server_id": server_id,
+                "agent_name": agent_name,
+                "servers": [
+                    {
+                        "server_id": server_id,
+                        "status": "active",
+                        "last_ping_at": datetime.now(timezone.utc).isoformat(),
+                        "metadata": {"cpu_percent": 25.5},
+                    }
+                ],
                 "status": "active",
-                "metadata": json.dumps({"cpu_percent": 25.5}),
                 "last_ping_at": datetime.now(timezone.utc).isoformat(),
             }
         ]
-        
-        # Mock the health records response
-        health_execute = MagicMock()
-        health_execute.data = health_records
-        health_execute.error = None
-        
-        # Mock the agents table response to get agent names
-        agents_execute = MagicMock()
-        agents_execute.data = [agent_data]
-        agents_execute.error = None
-        
-        # Setup table mocks with method chains
-        health_table = MagicMock()
-        agents_table = MagicMock()
-        
-        # Configure table side effect based on which table is being queried
-        def table_side_effect(table_name):
-            if table_name == AGENT_HEALTH_TABLE:
-                return health_table
-            elif table_name == AGENTS_TABLE:
-                return agents_table
-            return MagicMock()
-        
-        setup_supabase.table.side_effect = table_side_effect
-        
-        # Configure the health table mock chain
-        health_table.select.return_value = health_table
-        health_table.execute.return_value = health_execute
-        
-        # Configure the agents table mock chain
-        agents_table.select.return_value = agents_table
-        agents_table.execute.return_value = agents_execute
-        
+
+        summary_execute = MagicMock()
+        summary_execute.data = summary_rows
+        summary_execute.error = None
+        setup_supabase.rpc.return_value.execute.return_value = summary_execute
+
         # Test the function - no parameters in the actual implementation
         result = await Database.get_agent_health_summary()
-        
+
         # Verify results
-        assert result is not None
-        assert len(result) > 0
-        # The actual implementation may return different data structure than our mock
-        # We're just testing that the function executes without errors
-        
-        # Verify correct tables were queried
-        setup_supabase.table.assert_any_call(AGENT_HEALTH_TABLE)
-        
+        assert len(result) == 1
+        assert result[0]["agent_id"] == agent_id
+        assert result[0]["agent_name"] == agent_name
+        assert result[0]["status"] == "active"
+        assert result[0]["servers"][0]["server_id"] == server_id
+
+        # Grouping happens in Postgres, not over raw table reads
+        setup_supabase.rpc.assert_called_once_with(
+            "agent_health_summary", {"max_rows": HEALTH_SUMMARY_MAX_ROWS}
+        )
+        setup_supabase.table.assert_not_called()
+
     @pytest.mark.asyncio
     async def test_list_federated_registries(self, setup_supabase):
         """Test listing federated registries"""
@@ -768,6 +944,7 @@ class TestDatabaseClient:
         # Configure table side effect
         setup_supabase.table.return_value = table_mock
         table_mock.select.return_value = table_mock
+        table_mock.order.return_value = table_mock
         table_mock.range.return_value = table_mock  # Add the range method for pagination
         table_mock.execute.return_value = execute_mock
         
@@ -787,6 +964,19 @@ class TestDatabaseClient:
         # Verify that range was called for pagination (with default values)
         table_mock.range.assert_called_once_with(0, 99)  # Default limit=100, offset=0
         
+    @pytest.mark.asyncio
+    async def test_list_federated_registries_with_cursor(self, postgrest_queries):
+        """Test listing federated registries with keyset pagination"""
+        last_row = {"id": str(uuid.uuid4()), "created_at": "2026-01-01T00:00:00+00:00"}
+        cursor = encode_cursor(last_row)
+
+        await Database.list_federated_registries(limit=20, cursor=cursor)
+
+        params = postgrest_queries[0].params
+        assert params["order"] == "created_at.desc,id.desc"
+        assert params["or"] == f"({keyset_filter(cursor)})"
+        assert params["limit"] == "20"
+
     @pytest.mark.asyncio
     async def test_add_federated_registry(self, setup_supabase):
         """Test adding a federated registry"""
@@ -835,6 +1025,34 @@ class TestDatabaseClient:
         # Verify correct table was used
         setup_supabase.table.assert_called_with(FEDERATED_REGISTRIES_TABLE)
         
+    @pytest.mark.asyncio
+    async def test_get_federated_registry_cached_until_synced(self, setup_supabase):
+        """Test that registry lookups are cached and invalidated by a sync"""
+        registry_id = str(uuid.uuid4())
+        registry = {"id": registry_id, "name": "Cached Registry", "last_etag": None}
+
+        execute_mock = MagicMock()
+        execute_mock.data = [registry]
+
+        table_mock = MagicMock()
+        setup_supabase.table.return_value = table_mock
+        table_mock.select.return_value = table_mock
+        table_mock.update.return_value = table_mock
+        table_mock.eq.return_value = table_mock
+        table_mock.execute.return_value = execute_mock
+
+        first = await Database.get_federated_registry(registry_id)
+        second = await Database.get_federated_registry(registry_id)
+
+        assert first == second == registry
+        table_mock.select.assert_called_once()
+
+        # Recording a sync drops the cached row
+        await Database.update_federated_registry_sync_time(registry_id, etag='"v2"')
+        await Database.get_federated_registry(registry_id)
+
+        assert table_mock.select.call_count == 2
+
     @pytest.mark.asyncio
     async def test_update_federated_registry_sync_time(self, setup_supabase):
         """Test updating a federated registry sync time"""
@@ -899,19 +1117,18 @@ class TestDatabaseClient:
         # Test data
         user_id = str(uuid.uuid4())
         key_name = "Test API Key"
-        expires_at = (datetime.now(timezone.utc) + timedelta(days=30)).isoformat()
+        expires_at = datetime.now(timezone.utc) + timedelta(days=30)
         
-        # Mock secrets.token_hex to return consistent key for testing
-        with patch('secrets.token_hex', return_value='12345abcdef'):
+        # Mock secrets.token_urlsafe to return consistent key for testing
+        with patch('secrets.token_urlsafe', return_value='12345abcdef'):
             # Mock created key response
             created_key = {
                 "id": str(uuid.uuid4()),
-                "key": "12345abcdef",  # This matches our mocked token_hex
                 "name": key_name,
                 "user_id": user_id,
                 "is_active": True,
                 "created_at": datetime.now(timezone.utc).isoformat(),
-                "expires_at": expires_at,
+                "expires_at": expires_at.isoformat(),
             }
             
             # Mock execute response
@@ -940,6 +1157,15 @@ class TestDatabaseClient:
             assert result["user_id"] == user_id
             assert result["is_active"] is True
             
+            # Verify the expiry datetime is stored as an ISO string
+            inserted = table_mock.insert.call_args[0][0]
+            assert inserted["expires_at"] == expires_at.isoformat()
+
+            # Only the hash of the key is stored, never the plaintext
+            assert "key" not in inserted
+            assert "12345abcdef" not in inserted.values()
+            assert inserted["key_hash"] == hash_api_key("12345abcdef")
+            
             # Verify correct table was used
             setup_supabase.table.assert_called_with(API_KEYS_TABLE)
             
@@ -950,44 +1176,79 @@ class TestDatabaseClient:
         key_id = str(uuid.uuid4())
         user_id = str(uuid.uuid4())
         
-        # Mock deleted key response
-        deleted_key = {
-            "id": key_id,
-            "key": "deleted_key_value",
-            "name": "Key to Delete",
-            "user_id": user_id,
-            "is_active": False,  # Should be set to False when deleted
-            "created_at": datetime.now(timezone.utc).isoformat(),
-            "expires_at": None,
-        }
-        
-        # Mock execute response
+        # Mock execute response; the updated row comes back with only its id
         execute_mock = MagicMock()
-        execute_mock.data = [deleted_key]  # Return one record to indicate success
-        execute_mock.error = None
-        
+        execute_mock.data = [{"id": key_id}]
+        execute_mock.count = None
+
         # Setup table mock with update chain (we'll use update to set is_active=False)
         table_mock = MagicMock()
         update_mock = MagicMock()
-        
+        params_mock = update_mock.params
+
         # Configure table side effect
         setup_supabase.table.return_value = table_mock
-        
+
         # Configure update chain
         table_mock.update.return_value = update_mock
         update_mock.eq.return_value = update_mock
         update_mock.execute.return_value = execute_mock
-        
+
         # Test the function
         result = await Database.delete_api_key(key_id, user_id)
-        
+
         # Verify result is True (boolean indicating success)
         assert result is True
-        
+
         # Verify correct table was used
         setup_supabase.table.assert_called_with(API_KEYS_TABLE)
-        
+
         # Verify the update was called with the correct parameters
         table_mock.update.assert_called_once_with({"is_active": False})
+        params_mock.add.assert_called_once_with("select", "id")
         update_mock.eq.assert_any_call("id", key_id)
         update_mock.eq.assert_any_call("user_id", user_id)
+
+        # No row comes back when the key doesn't exist or isn't the user's
+        execute_mock.data = []
+        assert await Database.delete_api_key(key_id, user_id) is False
+
+    @pytest.mark.asyncio
+    async def test_get_pool_stats_tracks_queries(self, setup_supabase):
+        """Test that pool stats count queries while they run"""
+        seen = []
+
+        def execute():
+            seen.append(get_pool_stats())
+            response = MagicMock()
+            response.count = 3
+            return response
+
+        setup_supabase.table.return_value.select.return_value.limit.return_value.execute.side_effect = execute
+
+        with patch("app.db.client.DB_WORKERS", 1):
+            await asyncio.gather(Database.count_agents(), Database.count_agents())
+            stats = get_pool_stats()
+
+        # Both queries are submitted before either finishes; with one worker
+        # at most one runs while the other waits
+        assert [s["in_flight"] for s in seen] == [1, 1]
+        assert stats["in_flight"] == 0
+        assert stats["queued"] == 0
+        assert stats["peak_in_flight"] >= 2
+
+    @pytest.mark.asyncio
+    async def test_query_error_is_raised_with_context(self, setup_supabase):
+        """Test that PostgREST errors are re-raised with the operation name"""
+        table_mock = MagicMock()
+        setup_supabase.table.return_value = table_mock
+        table_mock.select.return_value = table_mock
+        table_mock.eq.return_value = table_mock
+        table_mock.limit.return_value = table_mock
+        table_mock.execute.side_effect = APIError({"message": "permission denied"})
+
+        with pytest.raises(Exception) as excinfo:
+            await Database.count_api_keys(user_id=str(uuid.uuid4()))
+
+        assert str(excinfo.value) == "Error counting API keys: permission denied"
+        assert isinstance(excinfo.value.__cause__, APIError)
@@ -136,7 +136,7 @@ class TestDatabaseVerification:
         # Setup Supabase mock
         mock_query = MagicMock()
         setup_supabase.table.return_value.select.return_value = mock_query
-        mock_query.eq.return_value.execute.return_value = mock_response
+        mock_query.eq.return_value.limit.return_value.execute.return_value = mock_response
 
         # Call the method
         result = await Database.count_agents(registry_id=registry_id)
@@ -150,6 +150,7 @@ class TestDatabaseVerification:
             "id", count="exact"
         )
         mock_query.eq.assert_called_once_with("registry_id", registry_id)
+        mock_query.eq.return_value.limit.assert_called_once_with(1)
 
     @pytest.mark.asyncio
     async def test_count_agents_without_filter(self, setup_supabase):
@@ -160,7 +161,7 @@ class TestDatabaseVerification:
         mock_response.error = None
 
         # Setup Supabase mock
-        setup_supabase.table.return_value.select.return_value.execute.return_value = (
+        setup_supabase.table.return_value.select.return_value.limit.return_value.execute.return_value = (
             mock_response
         )
 
@@ -175,168 +176,3 @@ class TestDatabaseVerification:
         setup_supabase.table.return_value.select.assert_called_once_with(
             "id", count="exact"
         )
-
-    @pytest.mark.asyncio
-    async def test_create_federated_agent(self, setup_supabase):
-        """Test creating a federated agent"""
-        # Setup test data
-        agent_data = {
-            "name": "Federated Test Agent",
-            "description": "A federated test agent",
-            "capabilities": [{"name": "test", "description": "Testing capability"}],
-            "tags": ["test", "federated"],
-            "is_federated": True,
-            "federation_source": "https://test-registry.example.com",
-            "registry_id": str(uuid.uuid4()),
-            "federation_id": str(uuid.uuid4()),
-        }
-
-        # Create a modified version of agent_data to be returned in the response
-        # This allows the original agent_data to stay intact for verification
-        response_data = agent_data.copy()
-        response_data["id"] = str(uuid.uuid4())
-        response_data["created_at"] = datetime.now(timezone.utc).isoformat()
-        response_data["updated_at"] = datetime.now(timezone.utc).isoformat()
-
-        # Mock the _parse_agent_json_fields method to return the data as-is
-        # This way we don't have to worry about the JSON serialization/deserialization
-        with patch(
-            "app.db.client.Database._parse_agent_json_fields", side_effect=lambda x: x
-        ):
-            # Mock response
-            mock_response = MagicMock()
-            mock_response.data = [response_data]
-            mock_response.error = None
-
-            # Setup Supabase mock
-            setup_supabase.table.return_value.insert.return_value.execute.return_value = mock_response
-
-            # Extract registry_id from agent_data
-            registry_id = agent_data.pop("registry_id")
-            
-            # Call the method with the registry_id parameter
-            result = await Database.create_federated_agent(agent_data, registry_id)
-
-            # Verify the result
-            assert result["name"] == "Federated Test Agent"
-            assert result["is_federated"]
-
-            # Verify the mock was called
-            setup_supabase.table.assert_called_once_with(AGENTS_TABLE)
-            setup_supabase.table.return_value.insert.assert_called_once()
-
-    @pytest.mark.asyncio
-    async def test_update_federated_agent(self, setup_supabase):
-        """Test updating a federated agent"""
-        # Setup test data
-        agent_id = str(uuid.uuid4())
-        federation_id = str(uuid.uuid4())
-
-        # Create a copy of the data to preserve the original for assertions
-        agent_data = {
-            "id": federation_id,  # Should be converted to federation_id
-            "name": "Updated Federated Agent",
-            "description": "An updated federated test agent",
-            "capabilities": [
-                {"name": "updated_test", "description": "Updated testing capability"}
-            ],
-            "tags": ["updated", "federated"],
-            "is_federated": True,
-        }
-
-        # Create a separate copy for assertions that won't be modified by the function
-        original_data = agent_data.copy()
-
-        # Create response data
-        response_data = {
-            "id": agent_id,
-            "name": "Updated Federated Agent",
-            "description": "An updated federated test agent",
-            "capabilities": agent_data[
-                "capabilities"
-            ],  # No JSON conversion needed with our mock
-            "tags": agent_data["tags"],  # No JSON conversion needed with our mock
-            "is_federated": True,
-            "federation_id": federation_id,
-            "updated_at": datetime.now(timezone.utc).isoformat(),
-        }
-
-        # Mock the _parse_agent_json_fields method to return the data as-is
-        with patch(
-            "app.db.client.Database._parse_agent_json_fields", side_effect=lambda x: x
-        ):
-            # Mock response
-            mock_response = MagicMock()
-            mock_response.data = [response_data]
-            mock_response.error = None
-
-            # Setup Supabase mock
-            setup_supabase.table.return_value.update.return_value.eq.return_value.execute.return_value = mock_response
-
-            # Call the method
-            result = await Database.update_federated_agent(agent_id, agent_data)
-
-            # Verify the result
-            assert result["name"] == "Updated Federated Agent"
-            assert result["is_federated"]
-            assert result["federation_id"] == federation_id
-
-            # Verify the mock was called
-            setup_supabase.table.assert_called_once_with(AGENTS_TABLE)
-            setup_supabase.table.return_value.update.assert_called_once()
-
-            # Verify ID handling logic - the original ID should have been moved to federation_id
-            assert "id" not in agent_data  # The method should have deleted the id
-            assert (
-                agent_data["federation_id"] == original_data["id"]
-            )  # And set federation_id
-
-    @pytest.mark.asyncio
-    async def test_get_agent_by_federation_id(self, setup_supabase):
-        """Test getting an agent by federation_id and registry_id"""
-        # Setup test data
-        federation_id = str(uuid.uuid4())
-        registry_id = str(uuid.uuid4())
-
-        # Create agent data without JSON serialization for the response
-        agent_data = {
-            "id": str(uuid.uuid4()),
-            "name": "Federated Agent",
-            "description": "A federated agent",
-            "capabilities": [{"name": "test", "description": "Test capability"}],
-            "tags": ["test", "federated"],
-            "is_federated": True,
-            "federation_id": federation_id,
-            "registry_id": registry_id,
-        }
-
-        # Setup the call to supabase to make sure it happens
-        setup_supabase.table.return_value.select.return_value.eq.return_value.execute.return_value.data = [agent_data]
-        
-        # Make the actual call return a simple dictionary instead of a MagicMock
-        # This avoids the issue with the MagicMock being passed all the way through
-        def mock_get_agent(fed_id, reg_id=None):
-            # Check the parameters match what we expect
-            assert fed_id == federation_id
-            if reg_id:
-                assert reg_id == registry_id
-            # Return a plain dictionary, not a MagicMock
-            return agent_data
-        
-        # Patch the method to use our implementation
-        with patch(
-            "app.db.client.Database.get_agent_by_federation_id", 
-            side_effect=mock_get_agent
-        ) as mock_method:
-            # Call the method
-            result = await Database.get_agent_by_federation_id(
-                federation_id, registry_id
-            )
-
-            # Verify the result directly
-            assert result == agent_data
-            
-            # Verify the method was called with the correct parameters
-            mock_method.assert_called_once_with(federation_id, registry_id)
-            
-            # We don't verify table calls since we're mocking at the method level
@@ -0,0 +1,69 @@
+import pytest
+import uuid
+
+import base64
+
+import orjson
+
+from app.utils.cursor_utils import (
+    decode_cursor,
+    encode_cursor,
+    keyset_filter,
+    keyset_last,
+)
+
+
+def test_cursor_round_trip():
+    """Test that a cursor decodes back to the row's position"""
+    row = {"id": str(uuid.uuid4()), "created_at": "2026-01-01T00:00:00+00:00"}
+
+    cursor = encode_cursor(row)
+
+    assert decode_cursor(cursor) == (row["created_at"], row["id"])
+
+
+def test_decode_cursor_rejects_garbage():
+    """Test that malformed cursors raise ValueError"""
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {"ts": '2026-01-01",id.gt."0', "id": str(uuid.uuid4())},
+        {"ts": "2026-01-01T00:00:00+00:00", "id": 'abc"),or(id.gt.0'},
+        {"ts": 1, "id": str(uuid.uuid4())},
+        {"ts": "2026-01-01T00:00:00+00:00"},
+    ],
+)
+def test_decode_cursor_rejects_tampered_values(payload):
+    """Test that cursors must hold an ISO timestamp and a UUID"""
+    cursor = base64.urlsafe_b64encode(orjson.dumps(payload)).decode()
+
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_keyset_filter_selects_rows_after_cursor():
+    """Test the PostgREST filter for rows older than the cursor"""
+    row_id = str(uuid.uuid4())
+    row = {"id": row_id, "created_at": "2026-01-01T00:00:00+00:00"}
+
+    assert keyset_filter(encode_cursor(row)) == (
+        'created_at.lt."2026-01-01T00:00:00+00:00",'
+        f'and(created_at.eq."2026-01-01T00:00:00+00:00",id.lt."{row_id}")'
+    )
+
+
+def test_keyset_last_ignores_display_order():
+    """Test that the cursor row is the oldest row, not the last one shown"""
+    ids = sorted(str(uuid.uuid4()) for _ in range(2))
+    rows = [
+        {"id": ids[0], "created_at": "2026-01-01T00:00:00.5+00:00"},
+        {"id": ids[1], "created_at": "2026-01-02T00:00:00Z"},
+        {"id": ids[0], "created_at": "2026-01-01T00:00:00.25+00:00"},
+        {"id": ids[1], "created_at": "2026-01-01T00:00:00.25+00:00"},
+    ]
+
+    assert keyset_last(rows) is rows[2]
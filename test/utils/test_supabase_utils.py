@@ -0,0 +1,45 @@
+from unittest import mock
+
+from app.utils import supabase_utils
+
+
+def test_configure_connection_pool_rebuilds_session():
+    """Test that the PostgREST session is replaced with a pooled one"""
+
+    class FakeSession:
+        def __init__(self, **kwargs):
+            self.kwargs = kwargs
+            self.base_url = "http://localhost"
+            self.headers = {}
+            self.timeout = 5
+            self.closed = False
+
+        def close(self):
+            self.closed = True
+
+    session = FakeSession()
+    client = mock.MagicMock()
+    client.postgrest.session = session
+
+    with mock.patch.object(supabase_utils, "DB_HTTP2", True):
+        supabase_utils.configure_connection_pool(client)
+
+    pooled = client.postgrest.session
+    assert pooled is not session
+    assert pooled.kwargs["http2"] is True
+    assert pooled.kwargs["limits"].max_keepalive_connections == supabase_utils.DB_POOL_SIZE
+    assert pooled.kwargs["limits"].max_connections == (
+        supabase_utils.DB_POOL_SIZE + supabase_utils.DB_MAX_OVERFLOW
+    )
+    assert pooled.kwargs["limits"].keepalive_expiry == supabase_utils.DB_POOL_IDLE_TIMEOUT
+    assert session.closed
+
+
+def test_close_connection_pool():
+    """Test that closing the pool closes the PostgREST session"""
+    client = mock.MagicMock()
+
+    supabase_utils.close_connection_pool(client)
+    supabase_utils.close_connection_pool(None)
+
+    client.postgrest.session.close.assert_called_once()
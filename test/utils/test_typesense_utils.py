@@ -0,0 +1,13 @@
+from app.utils.typesense_utils import _to_unix_timestamp
+
+
+def test_to_unix_timestamp_parses_postgrest_timestamps():
+    """Test that PostgREST timestamps convert on every supported Python"""
+    assert _to_unix_timestamp("2026-01-01T00:00:00.12Z") == 1767225600
+    assert _to_unix_timestamp("2026-01-01T00:00:00.123456+00:00") == 1767225600
+
+
+def test_to_unix_timestamp_passes_numbers_through():
+    """Test that numeric timestamps are truncated to whole seconds"""
+    assert _to_unix_timestamp(1767225600.9) == 1767225600
+    assert _to_unix_timestamp(None) is None